@@ -0,0 +1,734 @@
+"""Offline evaluation of the discount pipeline over a customer dataset.
+
+Streams customer profiles from a CSV, NDJSON or Parquet file, evaluates the
+discount rule table on a process pool and the LLM once per distinct profile,
+with a bounded number of concurrent calls, and appends one NDJSON result per
+row to the output file as each chunk completes. An interrupted run continues
+where it stopped with `--resume`. Reports throughput, the agreement between
+the rules and the LLM per customer profile, and the distribution of discounts.
+
+`--fake-llm` answers the GPT prompts locally, from the rule table with a share
+of deliberate disagreements, so the evaluation can run offline.
+
+Usage:
+    python -m app.ai.discount_evaluation app/ai/datasets/customer_discount_dataset.csv --fake-llm
+    python -m app.ai.discount_evaluation customers.parquet --output results.ndjson --resume
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.ai.gpt import services as gpt_services
+from app.cache import SingleFlight
+from app.services.customer_rentals_services import build_discount_calculator
+from app.services.discount_rules import (
+    MAX_LOOKUP_AGE,
+    CompiledDiscountRules,
+    get_discount_rules,
+    normalize_conditions,
+)
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is only needed for Parquet input
+    pq = None
+
+DATASET_FORMATS = ("csv", "ndjson", "parquet")
+
+# Accepted column names, the API's field names and those of the bundled dataset
+AGE_COLUMNS = ("age", "Age")
+DISABILITY_COLUMNS = ("is_disabled", "Disability Status")
+CONDITION_COLUMNS = ("medical_conditions", "Pre-existing Medical Condition")
+
+DISABLED_VALUES = frozenset({"disabled", "true", "yes", "1"})
+NOT_DISABLED_VALUES = frozenset({"not disabled", "false", "no", "0", ""})
+
+# Customer prompts as built by `build_discount_calculator`
+CUSTOMER_PROMPT_PATTERN = re.compile(
+    r"The customer is (-?\d+) years old\. (Disabled|Not Disabled)\. "
+    r"Medical conditions: (.*?)\.$"
+)
+
+# Customer profile as evaluated by the rules: age, disability and normalized conditions
+Profile = Tuple[int, bool, Tuple[str, ...]]
+
+
+def _column(record: Dict[str, Any], names: Tuple[str, ...]) -> Any:
+    for name in names:
+        if name in record:
+            return record[name]
+    return None
+
+
+def parse_profile(record: Dict[str, Any]) -> Profile:
+    """Extract the customer profile from a dataset record.
+
+    Args:
+        record (Dict[str, Any]): One row of the dataset.
+
+    Returns:
+        Profile: The age, disability status and normalized medical conditions.
+
+    Raises:
+        ValueError: If the age or disability status is missing or invalid.
+    """
+    age = _column(record, AGE_COLUMNS)
+    if age is None or str(age).strip() == "":
+        raise ValueError("The age is missing.")
+    try:
+        age = int(float(age))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid age '{age}'.")
+
+    disabled = _column(record, DISABILITY_COLUMNS)
+    if not isinstance(disabled, bool):
+        value = str(disabled or "").strip().lower()
+        if value not in DISABLED_VALUES | NOT_DISABLED_VALUES:
+            raise ValueError(f"Invalid disability status '{disabled}'.")
+        disabled = value in DISABLED_VALUES
+
+    conditions = _column(record, CONDITION_COLUMNS) or []
+    if isinstance(conditions, str):
+        conditions = re.split(r"[;,]", conditions)
+    return age, disabled, normalize_conditions(conditions)
+
+
+def detect_format(path: str) -> str:
+    """Return the dataset format implied by a file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def iter_dataset(path: str, dataset_format: str) -> Iterator[Any]:
+    """Stream the records of a dataset file without loading it into memory.
+
+    Args:
+        path (str): Path to the dataset.
+        dataset_format (str): One of ``"csv"``, ``"ndjson"`` or ``"parquet"``.
+
+    Yields:
+        Any: One record per row, or the ``ValueError`` raised while
+        decoding an NDJSON line.
+
+    Raises:
+        ValueError: If the format is unknown, or Parquet is requested without pyarrow installed.
+    """
+    if dataset_format == "csv":
+        import csv
+
+        with open(path, newline="", encoding="utf-8-sig") as dataset:
+            yield from csv.DictReader(dataset)
+    elif dataset_format == "ndjson":
+        with open(path, encoding="utf-8") as dataset:
+            for line in dataset:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as ve:
+                    record = ve
+                yield record if isinstance(record, (dict, ValueError)) else {}
+    elif dataset_format == "parquet":
+        if pq is None:
+            raise ValueError("Reading Parquet datasets requires the pyarrow package.")
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unknown dataset format '{dataset_format}'.")
+
+
+def age_band_labels(rules: CompiledDiscountRules) -> Dict[int, str]:
+    """Name each age band id of the rules after the range of ages it covers."""
+    ranges: Dict[int, List[int]] = {}
+    for age in range(MAX_LOOKUP_AGE + 1):
+        ranges.setdefault(rules.age_band(age), []).append(age)
+
+    labels = {}
+    for band, ages in ranges.items():
+        if ages[-1] == MAX_LOOKUP_AGE:
+            labels[band] = f"{ages[0]}+"
+        else:
+            labels[band] = f"{ages[0]}-{ages[-1]}"
+        if len(ages) != ages[-1] - ages[0] + 1:
+            labels[band] += " (split)"
+    return labels
+
+
+def evaluate_rules_chunk(profiles: List[Profile]) -> List[Tuple[int, str]]:
+    """Evaluate the rule table for a chunk of profiles, in a worker process.
+
+    Args:
+        profiles (List[Profile]): The customer profiles.
+
+    Returns:
+        List[Tuple[int, str]]: The rules discount and the profile label of each profile.
+    """
+    rules = get_discount_rules()
+    labels = age_band_labels(rules)
+    results = []
+    for age, disabled, conditions in profiles:
+        discount, _ = rules.evaluate(age, disabled, conditions)
+        band = labels.get(rules.age_band(age), "invalid age")
+        results.append(
+            (
+                discount,
+                f"age {band} | {'disabled' if disabled else 'not disabled'} | "
+                f"{', '.join(conditions) or 'none'}",
+            )
+        )
+    return results
+
+
+def _fake_answer(user_prompt: str, disagreement: float) -> int:
+    match = CUSTOMER_PROMPT_PATTERN.match(user_prompt.strip())
+    if match is None:
+        return 0
+    age, disabled, conditions = match.groups()
+    rules = get_discount_rules()
+    profile = (
+        int(age),
+        disabled == "Disabled",
+        normalize_conditions([] if conditions == "None" else conditions.split(", ")),
+    )
+    discount, _ = rules.evaluate(int(age), profile[1], profile[2])
+
+    # Disagree consistently for every customer with the same profile
+    rng = random.Random(hashlib.sha256(repr(profile).encode("utf-8")).digest())
+    if rng.random() < disagreement:
+        discount = max(0, discount + rng.choice((-10, -5, 5, 10)))
+    return discount
+
+
+def create_fake_llm_client(latency_seconds: float, disagreement: float) -> AsyncOpenAI:
+    """Create an OpenAI client whose chat completions are answered locally.
+
+    Single prompts are answered with the rules discount of the customer in the
+    prompt, batched prompts with a JSON array of them. A share of
+    `disagreement` prompts consistently gets a different discount.
+
+    Args:
+        latency_seconds (float): The time taken to answer each completion.
+        disagreement (float): The share of prompts (0-1) answered differently from the rules.
+
+    Returns:
+        AsyncOpenAI: The client, to be installed as the GPT services' async client.
+    """
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_seconds)
+        body = json.loads(request.content)
+        user_prompt = body["messages"][-1]["content"]
+
+        numbered = re.findall(r"^\d+\. (.*)$", user_prompt, flags=re.MULTILINE)
+        if numbered:
+            content = json.dumps([_fake_answer(p, disagreement) for p in numbered])
+        else:
+            content = str(_fake_answer(user_prompt, disagreement))
+
+        return httpx.Response(
+            200,
+            json={
+                "id": "fake-completion",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": len(user_prompt) // 4,
+                    "completion_tokens": 1,
+                    "total_tokens": len(user_prompt) // 4 + 1,
+                },
+            },
+        )
+
+    return AsyncOpenAI(
+        api_key="fake-llm",
+        base_url="http://fake-llm/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handle)),
+    )
+
+
+class EvaluationReport:
+    def __init__(self):
+        """Initialize the counters summarising the evaluated rows."""
+        self.rows = 0
+        self.invalid_rows = 0
+        self.llm_errors = 0
+        self.compared = 0
+        self.agreed = 0
+        self.rules_distribution: Counter = Counter()
+        self.llm_distribution: Counter = Counter()
+        # Per profile label: rows, compared rows, agreeing rows, rules and LLM discounts
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """Count one result row, as written to the output file."""
+        self.rows += 1
+        if result.get("rules_discount") is None:
+            self.invalid_rows += 1
+            return
+
+        self.rules_distribution[result["rules_discount"]] += 1
+        profile = self.profiles.setdefault(
+            result["profile"],
+            {
+                "rows": 0,
+                "compared": 0,
+                "agreed": 0,
+                "rules_discount": result["rules_discount"],
+                "llm_discounts": Counter(),
+            },
+        )
+        profile["rows"] += 1
+
+        if result.get("llm_discount") is None:
+            if result.get("error"):
+                self.llm_errors += 1
+            return
+
+        self.llm_distribution[result["llm_discount"]] += 1
+        self.compared += 1
+        profile["compared"] += 1
+        profile["llm_discounts"][result["llm_discount"]] += 1
+        if result["agree"]:
+            self.agreed += 1
+            profile["agreed"] += 1
+
+    def summary(self, elapsed: float, processed: int) -> Dict[str, Any]:
+        """Summarise the counted rows.
+
+        Args:
+            elapsed (float): The duration of this run in seconds.
+            processed (int): The rows evaluated by this run, excluding resumed rows.
+
+        Returns:
+            Dict[str, Any]: Throughput, agreement, per-profile agreement and discount distributions.
+        """
+        profiles = {
+            label: {
+                "rows": profile["rows"],
+                "compared": profile["compared"],
+                "agreement": (
+                    round(profile["agreed"] / profile["compared"], 4)
+                    if profile["compared"]
+                    else None
+                ),
+                "rules_discount": profile["rules_discount"],
+                "llm_discounts": {
+                    str(discount): count
+                    for discount, count in sorted(profile["llm_discounts"].items())
+                },
+            }
+            for label, profile in sorted(self.profiles.items())
+        }
+        return {
+            "rows": self.rows,
+            "processed_rows": processed,
+            "invalid_rows": self.invalid_rows,
+            "llm_errors": self.llm_errors,
+            "duration_seconds": round(elapsed, 3),
+            "throughput_rows_per_second": (
+                round(processed / elapsed, 1) if elapsed else None
+            ),
+            "agreement": (
+                round(self.agreed / self.compared, 4) if self.compared else None
+            ),
+            "profiles": profiles,
+            "rules_distribution": {
+                str(discount): count
+                for discount, count in sorted(self.rules_distribution.items())
+            },
+            "llm_distribution": {
+                str(discount): count
+                for discount, count in sorted(self.llm_distribution.items())
+            },
+        }
+
+
+def load_completed_rows(path: str, report: EvaluationReport) -> int:
+    """Count the results of a previous run and add them to the report.
+
+    A trailing partially written line is removed from the file.
+
+    Args:
+        path (str): The output file of the previous run.
+        report (EvaluationReport): The report to add the previous results to.
+
+    Returns:
+        int: The number of dataset rows already evaluated.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    completed = 0
+    valid_size = 0
+    with open(path, "rb") as output:
+        for line in output:
+            if not line.endswith(b"\n"):
+                break
+            report.add(json.loads(line))
+            completed += 1
+            valid_size += len(line)
+
+    with open(path, "r+b") as output:
+        output.truncate(valid_size)
+    return completed
+
+
+class LLMDiscountEvaluator:
+    def __init__(self, concurrency: int):
+        """Initialize the LLM side of the evaluation.
+
+        Each distinct profile, with its exact age, is sent to the LLM once with
+        the prompt of the rental pipeline, through its circuit breaker and GPT
+        batcher. The discount cache is bypassed: it is keyed on the age band, so
+        it would give every age in a band the answer of the first one asked.
+        Failed calculations are not remembered and are retried by later rows.
+
+        Args:
+            concurrency (int): The maximum number of LLM calculations in flight.
+        """
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._flights = SingleFlight()
+        self._discounts: Dict[Profile, int] = {}
+
+    async def evaluate(self, profile: Profile) -> Tuple[Optional[int], Optional[str]]:
+        """Calculate a profile's discount with the LLM.
+
+        Args:
+            profile (Profile): The customer profile.
+
+        Returns:
+            Tuple[Optional[int], Optional[str]]: The LLM discount, or None and the error.
+        """
+        discount = self._discounts.get(profile)
+        if discount is not None:
+            return discount, None
+        try:
+            discount = await self._flights.run(profile, lambda: self._query(profile))
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+        self._discounts[profile] = discount
+        return discount, None
+
+    async def _query(self, profile: Profile) -> int:
+        age, disabled, conditions = profile
+        calculator = build_discount_calculator(
+            {
+                "age": age,
+                "is_disabled": disabled,
+                "medical_conditions": list(conditions),
+            }
+        )
+        async with self._semaphore:
+            return await calculator.calculate_discount_using_llm()
+
+
+async def evaluate_chunk(
+    first_row: int,
+    records: List[Any],
+    pool: Optional[Executor],
+    llm: Optional[LLMDiscountEvaluator],
+) -> List[Dict[str, Any]]:
+    """Evaluate a chunk of dataset records with the rules and, unless disabled, the LLM.
+
+    Args:
+        first_row (int): The 1-based dataset row number of the first record.
+        records (List[Any]): The dataset records, as yielded by `iter_dataset`.
+        pool (Optional[Executor]): The process pool evaluating the rules, None to evaluate inline.
+        llm (Optional[LLMDiscountEvaluator]): Calculates the LLM discounts, None for rules only.
+
+    Returns:
+        List[Dict[str, Any]]: One result per record, in order.
+    """
+    results: List[Dict[str, Any]] = []
+    profiles: List[Profile] = []
+    for row, record in enumerate(records, start=first_row):
+        try:
+            if isinstance(record, ValueError):
+                raise ValueError(f"Invalid JSON: {record}")
+            profile = parse_profile(record)
+        except ValueError as ve:
+            results.append({"row": row, "error": str(ve)})
+            continue
+        profiles.append(profile)
+        results.append(
+            {
+                "row": row,
+                "age": profile[0],
+                "is_disabled": profile[1],
+                "medical_conditions": list(profile[2]),
+            }
+        )
+
+    # The LLM calculations run while the pool evaluates the rules
+    llm_task = (
+        asyncio.gather(*(llm.evaluate(profile) for profile in profiles))
+        if llm is not None
+        else None
+    )
+    if pool is None:
+        rules_results = evaluate_rules_chunk(profiles)
+    else:
+        rules_results = await asyncio.get_running_loop().run_in_executor(
+            pool, evaluate_rules_chunk, profiles
+        )
+    llm_results = (
+        await llm_task if llm_task is not None else [(None, None)] * len(profiles)
+    )
+
+    evaluated = iter(zip(rules_results, llm_results))
+    for result in results:
+        if "error" in result:
+            continue
+        (rules_discount, label), (llm_discount, error) = next(evaluated)
+        result.update(
+            profile=label,
+            rules_discount=rules_discount,
+            llm_discount=llm_discount,
+            agree=None if llm_discount is None else llm_discount == rules_discount,
+            error=error,
+        )
+    return results
+
+
+async def run_evaluation(args: argparse.Namespace) -> Dict[str, Any]:
+    """Evaluate the dataset chunk by chunk, appending the results to the output file.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        Dict[str, Any]: The summary of every row in the output file, see `EvaluationReport.summary`.
+    """
+    report = EvaluationReport()
+    skip = load_completed_rows(args.output, report) if args.resume else 0
+    if skip:
+        print(f"Resuming after {skip} evaluated rows.")
+
+    llm = None if args.rules_only else LLMDiscountEvaluator(args.llm_concurrency)
+
+    # The fake client replaces the GPT services' client for this run only
+    previous_client = gpt_services.async_client
+    previous_model = gpt_services.gpt_model
+    fake_client = None
+    if args.fake_llm:
+        fake_client = create_fake_llm_client(
+            args.fake_llm_latency_ms / 1000, args.fake_llm_disagreement
+        )
+        gpt_services.async_client = fake_client
+        gpt_services.gpt_model = gpt_services.gpt_model or "fake-llm"
+
+    pool = (
+        ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        if args.workers > 0
+        else None
+    )
+
+    records = iter_dataset(args.dataset, args.format or detect_format(args.dataset))
+    processed = 0
+    started = time.perf_counter()
+    try:
+        with open(args.output, "a" if args.resume else "w", encoding="utf-8") as output:
+
+            async def write_chunk(first_row: int, chunk: List[Dict[str, Any]]) -> None:
+                results = await evaluate_chunk(first_row, chunk, pool, llm)
+                output.writelines(json.dumps(result) + "\n" for result in results)
+                output.flush()
+                for result in results:
+                    report.add(result)
+
+            chunk: List[Dict[str, Any]] = []
+            first_row = skip + 1
+            for row, record in enumerate(records, start=1):
+                if row <= skip:
+                    continue
+                if args.limit is not None and processed + len(chunk) >= args.limit:
+                    break
+                chunk.append(record)
+                if len(chunk) >= args.chunk_size:
+                    await write_chunk(first_row, chunk)
+                    processed += len(chunk)
+                    first_row += len(chunk)
+                    chunk = []
+
+            if chunk:
+                await write_chunk(first_row, chunk)
+                processed += len(chunk)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if fake_client is None:
+            await gpt_services.close_clients()
+        else:
+            await fake_client.close()
+            gpt_services.async_client = previous_client
+            gpt_services.gpt_model = previous_model
+
+    return report.summary(time.perf_counter() - started, processed)
+
+
+def format_rate(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1%}"
+
+
+def print_summary(summary: Dict[str, Any], top: int) -> None:
+    print(
+        f"Evaluated {summary['processed_rows']} rows in {summary['duration_seconds']}s "
+        f"({summary['throughput_rows_per_second']} rows/s), {summary['rows']} in the output."
+    )
+    print(
+        f"Invalid rows: {summary['invalid_rows']}, LLM errors: {summary['llm_errors']}, "
+        f"rules/LLM agreement: {format_rate(summary['agreement'])}"
+    )
+
+    # Least agreeing profiles first, then the most common
+    profiles = sorted(
+        summary["profiles"].items(),
+        key=lambda item: (
+            1 if item[1]["agreement"] is None else item[1]["agreement"],
+            -item[1]["rows"],
+        ),
+    )
+    print()
+    print(f"{'profile':<60}{'rows':>7}{'agreement':>11}{'rules':>7}  llm")
+    for label, profile in profiles[:top]:
+        llm_discounts = ", ".join(
+            f"{discount}x{count}"
+            for discount, count in profile["llm_discounts"].items()
+        )
+        print(
+            f"{label:<60}{profile['rows']:>7}{format_rate(profile['agreement']):>11}"
+            f"{profile['rules_discount']:>7}  {llm_discounts or '-'}"
+        )
+    if len(profiles) > top:
+        print(f"... {len(profiles) - top} more profiles, see --summary")
+
+    print()
+    print(f"{'discount':<10}{'rules':>9}{'llm':>9}")
+    discounts = sorted(
+        {*summary["rules_distribution"], *summary["llm_distribution"]}, key=int
+    )
+    for discount in discounts:
+        print(
+            f"{discount + '%':<10}{summary['rules_distribution'].get(discount, 0):>9}"
+            f"{summary['llm_distribution'].get(discount, 0):>9}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Evaluate the rules and LLM discounts over a customer dataset."
+    )
+    parser.add_argument("dataset", help="CSV, NDJSON or Parquet file of customers")
+    parser.add_argument(
+        "--format",
+        choices=DATASET_FORMATS,
+        help="dataset format, inferred from the file extension by default",
+    )
+    parser.add_argument(
+        "--output",
+        default="discount_evaluation.ndjson",
+        help="NDJSON file receiving one result per dataset row",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue after the rows already in the output file",
+    )
+    parser.add_argument("--summary", help="write the full summary as JSON to this file")
+    parser.add_argument("--limit", type=int, help="evaluate at most this many rows")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="rows evaluated and written per chunk",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes evaluating the rules, 0 to evaluate them inline",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=16,
+        help="concurrent LLM discount calculations",
+    )
+    parser.add_argument(
+        "--rules-only", action="store_true", help="only evaluate the discount rules"
+    )
+    parser.add_argument(
+        "--fake-llm",
+        action="store_true",
+        help="answer the LLM prompts locally instead of calling OpenAI",
+    )
+    parser.add_argument(
+        "--fake-llm-latency-ms",
+        type=float,
+        default=50,
+        help="latency of each fake LLM completion",
+    )
+    parser.add_argument(
+        "--fake-llm-disagreement",
+        type=float,
+        default=0.05,
+        help="share of fake LLM answers that differ from the rules",
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="profiles listed in the printed report"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.chunk_size < 1 or args.llm_concurrency < 1 or args.workers < 0:
+        print(
+            "--chunk-size and --llm-concurrency must be positive, --workers not negative."
+        )
+        return 2
+
+    try:
+        summary = asyncio.run(run_evaluation(args))
+    except (OSError, ValueError) as e:
+        print(f"Evaluation failed: {e}")
+        return 1
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as summary_file:
+            json.dump(summary, summary_file, indent=2)
+    print_summary(summary, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
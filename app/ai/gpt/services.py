@@ -1,13 +1,99 @@
+import asyncio
 import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+)
 
+from app.circuit_breaker import CircuitBreaker
 from app.config import settings
+from app.http_pool import get_async_transport, get_sync_transport
+from app.metrics import (
+    LLM_RETRIES,
+    instrument_llm,
+    record_llm_usage,
+    record_request_time,
+    request_timings,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 gpt_model = settings.GPT_MODEL
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+# Created on first use or at startup, see get_client and get_async_client
+client: Optional[OpenAI] = None
+async_client: Optional[AsyncOpenAI] = None
+_client_lock = threading.Lock()
+
+# Bounds the number of in-flight LLM requests per worker
+llm_semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+# Fails discount calculations fast while the OpenAI API is failing, slow or saturated
+llm_circuit_breaker = CircuitBreaker(
+    name="openai",
+    window_size=settings.LLM_BREAKER_WINDOW_SIZE,
+    min_calls=settings.LLM_BREAKER_MIN_CALLS,
+    failure_rate_threshold=settings.LLM_BREAKER_FAILURE_RATE,
+    slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate_threshold=settings.LLM_BREAKER_SLOW_CALL_RATE,
+    open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.LLM_BREAKER_HALF_OPEN_CALLS,
+    max_pending=settings.LLM_MAX_PENDING,
+    call_timeout_seconds=settings.LLM_DISCOUNT_TIMEOUT_SECONDS or None,
+)
+
+
+def get_client() -> OpenAI:
+    """Return the OpenAI client, creating it on the shared connection pool on first use."""
+    global client
+    with _client_lock:
+        if client is None:
+            client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                http_client=DefaultHttpxClient(transport=get_sync_transport()),
+            )
+        return client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the asynchronous OpenAI client, creating it on the shared connection pool on first use."""
+    global async_client
+    with _client_lock:
+        if async_client is None:
+            # Retries are handled by async_query_gpt_model so the backoff can be jittered
+            async_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(transport=get_async_transport()),
+            )
+        return async_client
+
+
+async def close_clients() -> None:
+    """Close the OpenAI clients, later calls create new ones."""
+    global client, async_client
+    with _client_lock:
+        closing, client = client, None
+        closing_async, async_client = async_client, None
+    if closing is not None:
+        closing.close()
+    if closing_async is not None:
+        await closing_async.close()
 
 
+@instrument_llm("query_gpt_model")
 def query_gpt_model(system_message: str, user_prompt: str) -> str:
     """Send a request to the GPT model and return the generated response.
 
@@ -29,7 +115,7 @@ def query_gpt_model(system_message: str, user_prompt: str) -> str:
     """
     try:
         # Create a completion request to the OpenAI GPT model
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model=gpt_model,
             messages=[
                 {"role": "system", "content": system_message},
@@ -37,6 +123,7 @@ def query_gpt_model(system_message: str, user_prompt: str) -> str:
             ],
             temperature=0.7,
         )
+        record_llm_usage(response)
 
         # Check if the response contains choices and return the content
         if not response.choices:
@@ -45,13 +132,272 @@ def query_gpt_model(system_message: str, user_prompt: str) -> str:
         return response.choices[0].message.content.strip()
 
     except ValueError as ve:
-        print(f"ValueError encountered: {ve}")
+        logger.error("ValueError encountered: %s", ve)
         raise
     except ConnectionError as ce:
-        print(
-            f"ConnectionError encountered: {ce}. Please check your network connection."
+        logger.error(
+            "ConnectionError encountered: %s. Please check your network connection.", ce
         )
         raise
     except Exception as e:
-        print(f"An unexpected error occurred while querying the GPT model: {e}")
+        logger.error("An unexpected error occurred while querying the GPT model: %s", e)
         raise
+
+
+def _is_retryable_error(error: Exception) -> bool:
+    """Return whether a failed GPT request should be retried.
+
+    Timeouts, connection failures, rate limits (429) and server errors (5xx)
+    are considered transient.
+    """
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _retry_delay(attempt: int) -> float:
+    """Return the full-jitter exponential backoff delay for a retry attempt."""
+    return random.uniform(0, settings.OPENAI_RETRY_BACKOFF_SECONDS * (2**attempt))
+
+
+@instrument_llm("async_query_gpt_model")
+async def async_query_gpt_model(system_message: str, user_prompt: str) -> str:
+    """Send a request to the GPT model without blocking the event loop.
+
+    The asynchronous counterpart of `query_gpt_model`. Each attempt is bounded by
+    `settings.OPENAI_TIMEOUT_SECONDS`, transient failures are retried up to
+    `settings.OPENAI_MAX_RETRIES` times with jittered exponential backoff, and the
+    number of concurrent requests per worker is capped by `llm_semaphore`.
+
+    Args:
+        system_message (str): Instructions for the LLM that define its behavior.
+        user_prompt (str): The input prompt from the user that the LLM will respond to.
+
+    Returns:
+        str: The generated response from the GPT model, stripped of whitespace.
+
+    Raises:
+        ValueError: If the API response does not contain any choices.
+        TimeoutError: If the final attempt exceeds the per-call deadline.
+        Exception: If the request fails with a non-retryable error or retries are exhausted.
+    """
+    attempt = 0
+    while True:
+        try:
+            async with llm_semaphore:
+                response = await asyncio.wait_for(
+                    get_async_client().chat.completions.create(
+                        model=gpt_model,
+                        messages=[
+                            {"role": "system", "content": system_message},
+                            {"role": "user", "content": user_prompt},
+                        ],
+                        temperature=0.7,
+                    ),
+                    timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                )
+            record_llm_usage(response)
+
+            if not response.choices:
+                raise ValueError(
+                    "No response choices were returned from the GPT model."
+                )
+
+            return response.choices[0].message.content.strip()
+
+        except ValueError as ve:
+            logger.error("ValueError encountered: %s", ve)
+            raise
+        except Exception as e:
+            if not _is_retryable_error(e) or attempt >= settings.OPENAI_MAX_RETRIES:
+                logger.error(
+                    "An unexpected error occurred while querying the GPT model: %s", e
+                )
+                raise
+
+            delay = _retry_delay(attempt)
+            attempt += 1
+            LLM_RETRIES.inc(operation="async_query_gpt_model")
+            logger.warning(
+                "Transient error while querying the GPT model: %r. Retrying in %.2fs (attempt %s/%s).",
+                e,
+                delay,
+                attempt,
+                settings.OPENAI_MAX_RETRIES,
+            )
+            await asyncio.sleep(delay)
+
+
+BATCH_PROMPT_INSTRUCTIONS = """Apply the instructions above to each of the following {count} numbered inputs independently.
+Return only a JSON array containing exactly {count} numerical values, one per input and in the same order, without any additional text or explanation.
+
+"""
+
+
+def _batch_user_prompt(user_prompts: List[str]) -> str:
+    numbered_prompts = "\n".join(
+        f"{number}. {prompt}" for number, prompt in enumerate(user_prompts, start=1)
+    )
+    return BATCH_PROMPT_INSTRUCTIONS.format(count=len(user_prompts)) + numbered_prompts
+
+
+def _parse_batch_response(response: str, count: int) -> List[str]:
+    """Split a batched completion into one response string per input.
+
+    Raises:
+        ValueError: If the response is not a JSON array with `count` elements.
+    """
+    # Tolerate code fences or text around the array
+    start, end = response.find("["), response.rfind("]")
+    try:
+        values = json.loads(response[start : end + 1]) if start != -1 else None
+    except ValueError:
+        values = None
+
+    if not isinstance(values, list) or len(values) != count:
+        raise ValueError(
+            f"The batched response from the GPT model is not a JSON array of {count} values."
+        )
+
+    results = []
+    for value in values:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        results.append(str(value).strip())
+    return results
+
+
+class GPTMicroBatcher:
+    def __init__(self, max_batch_size: int, window_seconds: float):
+        """Initialize a batcher that sends many prompts in one GPT completion.
+
+        Prompts sharing a system message are collected until `max_batch_size`
+        prompts are pending or `window_seconds` have passed since the first one,
+        then sent as a single completion that returns a JSON array with one value
+        per prompt.
+
+        Args:
+            max_batch_size (int): The maximum number of prompts per completion.
+            window_seconds (float): How long the first prompt of a batch waits for others.
+        """
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_seconds
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._sending: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.prompts = 0
+
+    async def submit(self, system_message: str, user_prompt: str) -> str:
+        """Queue a prompt for the next batch and wait for its response.
+
+        Args:
+            system_message (str): Instructions for the LLM that define its behavior.
+            user_prompt (str): The input prompt from the user that the LLM will respond to.
+
+        Returns:
+            str: The response for this prompt, stripped of whitespace.
+
+        Raises:
+            ValueError: If the batched response cannot be split into one value per prompt.
+            Exception: If the batched GPT request fails.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.setdefault(system_message, [])
+        batch.append((user_prompt, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(system_message)
+        elif len(batch) == 1:
+            self._timers[system_message] = loop.call_later(
+                self.window_seconds, self._flush, system_message
+            )
+
+        # Each waiting request is charged its own wait as LLM time
+        started = time.perf_counter()
+        try:
+            return await future
+        finally:
+            record_request_time("llm", time.perf_counter() - started)
+
+    def _flush(self, system_message: str) -> None:
+        timer = self._timers.pop(system_message, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(system_message, None)
+        if batch:
+            task = asyncio.ensure_future(self._send(system_message, batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(
+        self, system_message: str, batch: List[Tuple[str, asyncio.Future]]
+    ) -> None:
+        self.batches += 1
+        self.prompts += len(batch)
+        # The send runs in the context of the request that started the flush,
+        # which already records its wait in submit
+        request_timings.set(None)
+
+        try:
+            if len(batch) == 1:
+                results = [await async_query_gpt_model(system_message, batch[0][0])]
+            else:
+                response = await async_query_gpt_model(
+                    system_message, _batch_user_prompt([prompt for prompt, _ in batch])
+                )
+                results = _parse_batch_response(response, len(batch))
+        except BaseException as e:
+            # Cancelling the send, e.g. at shutdown, cancels the prompts waiting on it
+            for _, future in batch:
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of batches and prompts sent so far."""
+        return {
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "pending": sum(len(batch) for batch in self._pending.values()),
+        }
+
+
+gpt_batcher: Optional[GPTMicroBatcher] = None
+if settings.OPENAI_BATCH_WINDOW_MS > 0 and settings.OPENAI_BATCH_MAX_SIZE > 1:
+    gpt_batcher = GPTMicroBatcher(
+        max_batch_size=settings.OPENAI_BATCH_MAX_SIZE,
+        window_seconds=settings.OPENAI_BATCH_WINDOW_MS / 1000,
+    )
+
+
+async def batched_query_gpt_model(system_message: str, user_prompt: str) -> str:
+    """Send a prompt to the GPT model through the micro-batcher when it is enabled.
+
+    Falls back to `async_query_gpt_model` when `settings.OPENAI_BATCH_WINDOW_MS` is 0.
+
+    Args:
+        system_message (str): Instructions for the LLM that define its behavior.
+        user_prompt (str): The input prompt from the user that the LLM will respond to.
+
+    Returns:
+        str: The generated response for this prompt, stripped of whitespace.
+    """
+    if gpt_batcher is None:
+        return await async_query_gpt_model(system_message, user_prompt)
+    return await gpt_batcher.submit(system_message, user_prompt)
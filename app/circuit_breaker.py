@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+T = TypeVar("T")
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_STATES = (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a circuit breaker rejects a call without running it."""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"The '{name}' circuit rejected the call: {reason}.")
+        self.reason = reason
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window_size: int,
+        min_calls: int,
+        failure_rate_threshold: float,
+        slow_call_seconds: float,
+        slow_call_rate_threshold: float,
+        open_seconds: float,
+        half_open_max_calls: int,
+        max_pending: int,
+        call_timeout_seconds: Optional[float] = None,
+    ):
+        """Initialize a circuit breaker and admission controller for calls to an upstream service.
+
+        The outcome of the last `window_size` calls is kept. Once at least
+        `min_calls` are recorded and the share of failed calls or of calls
+        slower than `slow_call_seconds` reaches its threshold, the circuit opens
+        and calls are rejected immediately for `open_seconds`. Then up to
+        `half_open_max_calls` probe calls are let through: the circuit closes
+        when they all succeed and opens again when one fails.
+
+        Calls are also rejected while `max_pending` calls are already running,
+        so a slow upstream cannot pile up waiting requests, and each call is
+        cancelled after `call_timeout_seconds`.
+
+        Args:
+            name (str): The upstream service name, used in logs and errors.
+            window_size (int): The number of recent calls the rates are computed over.
+            min_calls (int): The number of recorded calls needed before the circuit can open.
+            failure_rate_threshold (float): The share of failed calls (0-1) that opens the circuit.
+            slow_call_seconds (float): Calls taking longer than this are counted as slow.
+            slow_call_rate_threshold (float): The share of slow calls (0-1) that opens the circuit.
+            open_seconds (float): How long the circuit stays open before probe calls are allowed.
+            half_open_max_calls (int): The number of probe calls let through while half-open.
+            max_pending (int): The maximum number of concurrent calls, 0 for no limit.
+            call_timeout_seconds (Optional[float]): The deadline of a single call, None for no deadline.
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.max_pending = max_pending
+        self.call_timeout_seconds = call_timeout_seconds
+
+        # (failed, slow) outcome of each recent call
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self.state = CIRCUIT_CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.pending = 0
+
+        self.opened = 0
+        self.rejected: Dict[str, int] = {"open": 0, "overloaded": 0}
+
+    def _open(self, reason: str) -> None:
+        self.state = CIRCUIT_OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning(
+            "Opened the '%s' circuit for %ss: %s.", self.name, self.open_seconds, reason
+        )
+
+    def _admit(self) -> bool:
+        """Reserve a slot for a call, returning whether it is a half-open probe.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or too many calls are pending.
+        """
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected["open"] += 1
+                raise CircuitOpenError(self.name, "circuit open")
+            self.state = CIRCUIT_HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+            logger.info("Letting probe calls through the '%s' circuit.", self.name)
+
+        probe = self.state == CIRCUIT_HALF_OPEN
+        if probe and self._probes >= self.half_open_max_calls:
+            self.rejected["open"] += 1
+            raise CircuitOpenError(self.name, "waiting for probe calls")
+        if self.max_pending and self.pending >= self.max_pending:
+            self.rejected["overloaded"] += 1
+            raise CircuitOpenError(self.name, f"{self.pending} calls already pending")
+
+        if probe:
+            self._probes += 1
+        self.pending += 1
+        return probe
+
+    def _release(self, probe: bool) -> None:
+        """Free the slot of a call that ended without an outcome, returning its probe permit."""
+        self.pending -= 1
+        if probe and self.state == CIRCUIT_HALF_OPEN:
+            self._probes -= 1
+
+    def _record(self, probe: bool, failed: bool, slow: bool) -> None:
+        self.pending -= 1
+
+        if probe:
+            if self.state != CIRCUIT_HALF_OPEN:
+                return
+            if failed:
+                self._open("probe call failed")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_max_calls:
+                self.state = CIRCUIT_CLOSED
+                logger.info("Closed the '%s' circuit.", self.name)
+            return
+
+        if self.state != CIRCUIT_CLOSED:
+            return
+
+        self._outcomes.append((failed, slow))
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+
+        failure_rate = sum(outcome[0] for outcome in self._outcomes) / calls
+        slow_rate = sum(outcome[1] for outcome in self._outcomes) / calls
+        if failure_rate >= self.failure_rate_threshold:
+            self._open(f"{failure_rate:.0%} of the last {calls} calls failed")
+        elif slow_rate >= self.slow_call_rate_threshold:
+            self._open(
+                f"{slow_rate:.0%} of the last {calls} calls took over {self.slow_call_seconds}s"
+            )
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Run a call to the upstream service through the circuit breaker.
+
+        Args:
+            func (Callable[[], Awaitable[T]]): Makes the call.
+
+        Returns:
+            T: The result of the call.
+
+        Raises:
+            CircuitOpenError: If the call was rejected without running it.
+            asyncio.TimeoutError: If the call exceeded `call_timeout_seconds`.
+            Exception: Whatever the call raised.
+        """
+        probe = self._admit()
+        started = time.monotonic()
+        try:
+            if self.call_timeout_seconds:
+                result = await asyncio.wait_for(func(), self.call_timeout_seconds)
+            else:
+                result = await func()
+        except asyncio.CancelledError:
+            # The caller gave up, which says nothing about the upstream
+            self._release(probe)
+            raise
+        except BaseException:
+            self._record(
+                probe, True, time.monotonic() - started > self.slow_call_seconds
+            )
+            raise
+
+        self._record(probe, False, time.monotonic() - started > self.slow_call_seconds)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the circuit state, pending calls and rejection counters."""
+        return {
+            "state": self.state,
+            "pending": self.pending,
+            "opened": self.opened,
+            "rejected": dict(self.rejected),
+        }
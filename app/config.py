@@ -21,9 +21,146 @@ class Settings(BaseSettings):
     SUPABASE_PROJECT_URL: str = os.getenv("SUPABASE_PROJECT_URL", "")
     SUPABASE_API_KEY: str = os.getenv("SUPABASE_API_KEY", "")
     SUPABASE_DB_PASSWORD: str = os.getenv("SUPABASE_DB_PASSWORD", "")
+    SUPABASE_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+    # Either "supabase" or "sqlite"
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "supabase")
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "bowling.db")
+
+    # Size of the thread pool that runs blocking database calls
+    DB_MAX_WORKERS: int = int(os.getenv("DB_MAX_WORKERS", "16"))
+
+    # Read-through cache of customers used by rental creation
+    CUSTOMER_CACHE_MAX_SIZE: int = int(os.getenv("CUSTOMER_CACHE_MAX_SIZE", "10000"))
+    CUSTOMER_CACHE_TTL_SECONDS: float = float(
+        os.getenv("CUSTOMER_CACHE_TTL_SECONDS", "300")
+    )
+
+    # How long a list endpoint reuses a table's version before reading it again
+    TABLE_VERSION_TTL_SECONDS: float = float(
+        os.getenv("TABLE_VERSION_TTL_SECONDS", "1")
+    )
+
+    # Maximum number of rentals accepted by the batch rental endpoint
+    RENTAL_BATCH_MAX_SIZE: int = int(os.getenv("RENTAL_BATCH_MAX_SIZE", "200"))
+
+    # Customers inserted per query by the bulk customer import endpoint
+    CUSTOMER_IMPORT_CHUNK_SIZE: int = int(
+        os.getenv("CUSTOMER_IMPORT_CHUNK_SIZE", "500")
+    )
+
+    # In-process queue used by asynchronous rental creation
+    RENTAL_QUEUE_MAX_SIZE: int = int(os.getenv("RENTAL_QUEUE_MAX_SIZE", "1000"))
+    RENTAL_QUEUE_WORKERS: int = int(os.getenv("RENTAL_QUEUE_WORKERS", "4"))
+    RENTAL_JOB_TTL_SECONDS: float = float(os.getenv("RENTAL_JOB_TTL_SECONDS", "3600"))
+
+    # Validate list responses against their schema while encoding them
+    RESPONSE_VALIDATION: bool = os.getenv("RESPONSE_VALIDATION", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+    # How often reserved and returned shoes are written back to the inventory table
+    INVENTORY_FLUSH_INTERVAL_SECONDS: float = float(
+        os.getenv("INVENTORY_FLUSH_INTERVAL_SECONDS", "1")
+    )
+
+    # Responses replayed for retried requests carrying an Idempotency-Key header
+    IDEMPOTENCY_CACHE_MAX_SIZE: int = int(
+        os.getenv("IDEMPOTENCY_CACHE_MAX_SIZE", "10000")
+    )
+    IDEMPOTENCY_TTL_SECONDS: float = float(
+        os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")
+    )
+
+    # Rows fetched per query by the streaming export endpoints
+    EXPORT_PAGE_SIZE: int = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+    # New rentals read per query when refreshing the report rollups
+    REPORT_PAGE_SIZE: int = int(os.getenv("REPORT_PAGE_SIZE", "5000"))
+
+    # Connection pool shared by the Supabase and OpenAI HTTP clients
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(
+        os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30")
+    )
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "true").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+    # Open database and OpenAI connections on startup, before the first request
+    CLIENT_WARMUP: bool = os.getenv("CLIENT_WARMUP", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    CLIENT_WARMUP_CONNECTIONS: int = int(os.getenv("CLIENT_WARMUP_CONNECTIONS", "4"))
 
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     GPT_MODEL: str = os.getenv("OPENAI_GPT_MODEL", "")
+    OPENAI_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "10"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+    OPENAI_RETRY_BACKOFF_SECONDS: float = float(
+        os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", "0.5")
+    )
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+    # Micro-batching of discount prompts, disabled while the window is 0
+    OPENAI_BATCH_WINDOW_MS: float = float(os.getenv("OPENAI_BATCH_WINDOW_MS", "0"))
+    OPENAI_BATCH_MAX_SIZE: int = int(os.getenv("OPENAI_BATCH_MAX_SIZE", "16"))
+
+    # Circuit breaker and admission control of the LLM discount calculations
+    LLM_BREAKER_WINDOW_SIZE: int = int(os.getenv("LLM_BREAKER_WINDOW_SIZE", "20"))
+    LLM_BREAKER_MIN_CALLS: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+    LLM_BREAKER_FAILURE_RATE: float = float(
+        os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")
+    )
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = float(
+        os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "5")
+    )
+    LLM_BREAKER_SLOW_CALL_RATE: float = float(
+        os.getenv("LLM_BREAKER_SLOW_CALL_RATE", "0.8")
+    )
+    LLM_BREAKER_OPEN_SECONDS: float = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+    LLM_BREAKER_HALF_OPEN_CALLS: int = int(
+        os.getenv("LLM_BREAKER_HALF_OPEN_CALLS", "3")
+    )
+    LLM_MAX_PENDING: int = int(os.getenv("LLM_MAX_PENDING", "64"))
+    LLM_DISCOUNT_TIMEOUT_SECONDS: float = float(
+        os.getenv("LLM_DISCOUNT_TIMEOUT_SECONDS", "15")
+    )
+
+    # Discount used while the LLM is unavailable, "rules" or "last_known"
+    DISCOUNT_DEGRADED_STRATEGY: str = os.getenv("DISCOUNT_DEGRADED_STRATEGY", "rules")
+
+    # One of "rules", "rules_then_llm" or "llm"
+    DISCOUNT_MODE: str = os.getenv("DISCOUNT_MODE", "rules_then_llm")
+    DISCOUNT_RULES_PATH: str = os.getenv("DISCOUNT_RULES_PATH", "")
+    DISCOUNT_CACHE_MAX_SIZE: int = int(os.getenv("DISCOUNT_CACHE_MAX_SIZE", "10000"))
+    DISCOUNT_CACHE_TTL_SECONDS: float = float(
+        os.getenv("DISCOUNT_CACHE_TTL_SECONDS", "3600")
+    )
+
+    # Structured logging, written by a background thread, see app.logging_config
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "")
+    LOG_QUEUE_MAX_SIZE: int = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
+
+    # Report per-request database and GPT time in a Server-Timing response header
+    SERVER_TIMING_ENABLED: bool = os.getenv(
+        "SERVER_TIMING_ENABLED", "false"
+    ).lower() in (
+        "1",
+        "true",
+        "yes",
+    )
 
     model_config = SettingsConfigDict(case_sensitive=True)
 
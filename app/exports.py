@@ -0,0 +1,131 @@
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from starlette.responses import StreamingResponse
+
+from app.config import settings
+from app.pagination import retrieve_page
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def iter_table_rows(
+    table: str,
+    columns: List[str],
+    filters: Optional[Dict[str, Any]] = None,
+    page_size: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every row of a table, fetching it one keyset page at a time.
+
+    Only a single page is held in memory at any time.
+
+    Args:
+        table (str): The name of the table to export.
+        columns (List[str]): A list of column names to select, must include `id`.
+        filters (Optional[Dict[str, Any]]): Filter conditions, see `retrieve_query`.
+        page_size (Optional[int]): Rows fetched per query, defaults to `settings.EXPORT_PAGE_SIZE`.
+
+    Yields:
+        Dict[str, Any]: The table rows ordered by `id`.
+    """
+    cursor: Optional[str] = None
+    while True:
+        rows, cursor = await retrieve_page(
+            table=table,
+            columns=columns,
+            filters=filters,
+            limit=page_size or settings.EXPORT_PAGE_SIZE,
+            cursor=cursor,
+        )
+        for row in rows:
+            yield row
+        if cursor is None:
+            return
+
+
+async def _ndjson_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, separators=(",", ":")) + "\n"
+
+
+def _csv_value(value: Any) -> Any:
+    # Nested values such as contact_info are written as JSON
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+async def _csv_lines(
+    rows: AsyncIterator[Dict[str, Any]], columns: List[str]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    async for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue()
+
+
+async def _logged(lines: AsyncIterator[str], table: str) -> AsyncIterator[str]:
+    count = 0
+    try:
+        async for line in lines:
+            count += 1
+            yield line
+    except Exception as e:
+        # The status line is already sent, so the stream can only be cut short
+        logger.error("Export of table '%s' failed after %s lines: %s", table, count, e)
+        raise
+    logger.info("Successfully exported %s lines from table '%s'.", count, table)
+
+
+def export_response(
+    table: str,
+    columns: List[str],
+    export_format: str,
+    filters: Optional[Dict[str, Any]] = None,
+) -> StreamingResponse:
+    """Build a streaming response exporting a whole table as NDJSON or CSV.
+
+    Args:
+        table (str): The name of the table to export.
+        columns (List[str]): A list of column names to export, must include `id`.
+        export_format (str): Either ``"ndjson"`` or ``"csv"``.
+        filters (Optional[Dict[str, Any]]): Filter conditions, see `retrieve_query`.
+
+    Returns:
+        StreamingResponse: A response that streams the rows as they are fetched.
+
+    Raises:
+        ValueError: If the export format is not supported.
+    """
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format: '{export_format}'.")
+
+    rows = iter_table_rows(table=table, columns=columns, filters=filters)
+    if export_format == "csv":
+        lines = _csv_lines(rows, columns)
+    else:
+        lines = _ndjson_lines(rows)
+
+    return StreamingResponse(
+        _logged(lines, table),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{table}.{export_format}"'
+        },
+    )
@@ -0,0 +1,72 @@
+import importlib.util
+import logging
+import threading
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_sync_transport: Optional[httpx.HTTPTransport] = None
+_async_transport: Optional[httpx.AsyncHTTPTransport] = None
+_lock = threading.Lock()
+
+
+def http2_enabled() -> bool:
+    """Return whether HTTP/2 is enabled and the `h2` package is installed."""
+    return settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def http_limits() -> httpx.Limits:
+    """Return the connection pool limits shared by the outbound HTTP clients."""
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def get_sync_transport() -> httpx.HTTPTransport:
+    """Return the keep-alive connection pool shared by the blocking HTTP clients.
+
+    The Supabase PostgREST session and the synchronous OpenAI client send
+    their requests through this transport, so they reuse one set of pooled
+    connections while keeping their own base URLs and headers.
+    """
+    global _sync_transport
+    with _lock:
+        if _sync_transport is None:
+            _sync_transport = httpx.HTTPTransport(
+                http2=http2_enabled(), limits=http_limits()
+            )
+            logger.info(
+                "Created the shared HTTP connection pool (HTTP/2: %s).", http2_enabled()
+            )
+        return _sync_transport
+
+
+def get_async_transport() -> httpx.AsyncHTTPTransport:
+    """Return the keep-alive connection pool shared by the asynchronous HTTP clients."""
+    global _async_transport
+    with _lock:
+        if _async_transport is None:
+            _async_transport = httpx.AsyncHTTPTransport(
+                http2=http2_enabled(), limits=http_limits()
+            )
+        return _async_transport
+
+
+async def close_transports() -> None:
+    """Close the pooled connections of both transports."""
+    global _sync_transport, _async_transport
+    with _lock:
+        sync_transport, _sync_transport = _sync_transport, None
+        async_transport, _async_transport = _async_transport, None
+
+    if sync_transport is not None:
+        sync_transport.close()
+    if async_transport is not None:
+        await async_transport.aclose()
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, Tuple
+
+from starlette.responses import Response
+
+from app.cache import MISSING, SingleFlight, TTLCache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Response headers kept with a stored response and sent again on replays
+REPLAYED_HEADERS = ("location", "content-type")
+
+# The request fingerprint, status code, body and headers of a stored response
+StoredResponse = Tuple[str, int, bytes, Dict[str, str]]
+
+
+class IdempotencyKeyMismatchError(ValueError):
+    """Raised when an idempotency key is reused for a different request."""
+
+
+def request_fingerprint(*parts: str) -> str:
+    """Return a digest identifying a request, e.g. from its serialized body and options."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        """Initialize a store of the responses of requests carrying an idempotency key.
+
+        The first successful (2xx) response for a key is kept for `ttl_seconds`,
+        and later requests with the same key get that response back without
+        running the handler again. Duplicates arriving while the first request
+        is still running wait for its result. Failed requests are not stored,
+        so a retry after an error runs the handler again.
+
+        Args:
+            max_size (int): The maximum number of stored responses.
+            ttl_seconds (float): How long a response is replayed for after it was stored.
+        """
+        self.responses = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.flights = SingleFlight()
+        self.replays = 0
+
+    @staticmethod
+    def _check_fingerprint(stored: StoredResponse, fingerprint: str) -> None:
+        if stored[0] != fingerprint:
+            raise IdempotencyKeyMismatchError(
+                f"The {IDEMPOTENCY_KEY_HEADER} was already used for a different request."
+            )
+
+    @staticmethod
+    def _response(stored: StoredResponse, replayed: bool) -> Response:
+        _, status_code, body, headers = stored
+        headers = dict(headers)
+        if replayed:
+            headers[IDEMPOTENT_REPLAY_HEADER] = "true"
+        return Response(content=body, status_code=status_code, headers=headers)
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """Run a handler once per idempotency key and replay its response.
+
+        Args:
+            scope (str): The operation the key belongs to, e.g. ``"create_customer_rental"``.
+            key (str): The client supplied idempotency key.
+            fingerprint (str): Identifies the request, see `request_fingerprint`.
+            handler (Callable[[], Awaitable[Response]]): Produces the response of the first request.
+
+        Returns:
+            Response: The handler's response, or the stored one with the `Idempotent-Replayed` header.
+
+        Raises:
+            IdempotencyKeyMismatchError: If the key is invalid or was used for a different request.
+            Exception: Whatever the handler raised, for the request and its concurrent duplicates.
+        """
+        if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            raise IdempotencyKeyMismatchError(
+                f"The {IDEMPOTENCY_KEY_HEADER} header must be 1 to "
+                f"{MAX_IDEMPOTENCY_KEY_LENGTH} characters long."
+            )
+
+        cache_key = (scope, key)
+        stored = self.responses.get(cache_key)
+        if stored is not MISSING:
+            self._check_fingerprint(stored, fingerprint)
+            self.replays += 1
+            logger.info("Replaying the stored response of idempotency key %s.", key)
+            return self._response(stored, replayed=True)
+
+        started = False
+
+        async def execute() -> StoredResponse:
+            nonlocal started
+            started = True
+            response = await handler()
+            result = (
+                fingerprint,
+                response.status_code,
+                bytes(response.body),
+                {
+                    name: value
+                    for name, value in response.headers.items()
+                    if name in REPLAYED_HEADERS
+                },
+            )
+            if 200 <= response.status_code < 300:
+                self.responses.set(cache_key, result)
+            return result
+
+        # Concurrent duplicates wait for the request already running
+        result = await self.flights.run(cache_key, execute)
+        if not started:
+            self._check_fingerprint(result, fingerprint)
+            self.replays += 1
+        return self._response(result, replayed=not started)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the stored response cache counters and the number of replays."""
+        return {**self.responses.stats(), "replays": self.replays}
+
+
+idempotency_store = IdempotencyStore(
+    max_size=settings.IDEMPOTENCY_CACHE_MAX_SIZE,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+)
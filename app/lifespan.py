@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI
+
+from app import queries
+from app.ai.gpt import services as gpt_services
+from app.config import settings
+from app.http_pool import close_transports
+from app.services.inventory import shoe_inventory
+from app.services.rental_jobs import rental_job_queue
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+async def warm_up_clients() -> None:
+    """Open pooled connections to the database and the OpenAI API before serving traffic.
+
+    Runs `settings.CLIENT_WARMUP_CONNECTIONS` concurrent lightweight queries, so
+    that many database worker threads and keep-alive connections are ready, and
+    one request to the OpenAI models endpoint. Failures are logged and ignored.
+    """
+
+    async def warm_up_database() -> None:
+        await queries.async_retrieve_query(table="customers", columns=["id"], limit=1)
+
+    async def warm_up_openai() -> None:
+        await asyncio.wait_for(
+            gpt_services.get_async_client().models.retrieve(gpt_services.gpt_model),
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+        )
+
+    warm_ups = [warm_up_database() for _ in range(settings.CLIENT_WARMUP_CONNECTIONS)]
+    if settings.OPENAI_API_KEY and gpt_services.gpt_model:
+        warm_ups.append(warm_up_openai())
+
+    results = await asyncio.gather(*warm_ups, return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    for failure in failures:
+        logger.warning("Client warm-up request failed: %r", failure)
+    logger.info("Warmed up clients with %s requests.", len(results) - len(failures))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create the external clients on startup and close them on shutdown.
+
+    The storage backend and the OpenAI clients are created here rather than
+    when the modules are imported, on the shared keep-alive connection pool,
+    and optionally warmed up before the first request.
+    """
+    queries.get_backend()
+    if settings.OPENAI_API_KEY:
+        gpt_services.get_async_client()
+    if settings.CLIENT_WARMUP:
+        await warm_up_clients()
+    await shoe_inventory.start()
+
+    yield
+
+    await rental_job_queue.stop()
+    await shoe_inventory.stop()
+    await gpt_services.close_clients()
+    queries.close_backend()
+    await close_transports()
+    logger.info("Closed the external clients.")
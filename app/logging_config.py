@@ -0,0 +1,232 @@
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+MAX_REQUEST_ID_LENGTH = 128
+
+# Id of the request being handled, copied into database worker threads and background tasks
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse per-logger sample rates, e.g. ``"app.queries=0.1,app.routers=0.5"``.
+
+    Args:
+        value (str): Comma-separated ``logger=rate`` pairs, rates between 0 and 1.
+
+    Returns:
+        Dict[str, float]: The sample rate of each logger name prefix.
+
+    Raises:
+        ValueError: If a pair is malformed or a rate is out of range.
+    """
+    rates: Dict[str, float] = {}
+    for pair in filter(None, (pair.strip() for pair in value.split(","))):
+        name, separator, rate = pair.partition("=")
+        if not separator or not 0 <= float(rate) <= 1:
+            raise ValueError(f"Invalid log sample rate '{pair}'.")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the id of the current request to every record as `request_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: Dict[str, float]):
+        """Initialize a filter keeping a share of the INFO and DEBUG records of some loggers.
+
+        The rate of the longest configured prefix of a record's logger name
+        applies. Warnings and errors, and records of loggers without a rate,
+        are always kept.
+
+        Args:
+            rates (Dict[str, float]): The share of records (0-1) kept per logger name prefix.
+        """
+        super().__init__()
+        self.rates = rates
+        self._logger_rates: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._logger_rates.get(name)
+        if rate is None:
+            prefixes = [
+                prefix
+                for prefix in self.rates
+                if name == prefix or name.startswith(prefix + ".")
+            ]
+            rate = self.rates[max(prefixes, key=len)] if prefixes else 1.0
+            self._logger_rates[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hand records to the logging thread without formatting them.
+
+    Unlike `QueueHandler`, the message is not formatted on the calling thread:
+    the record is queued with its arguments and formatted by the listener.
+    Records are dropped when the queue is full rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """A `QueueListener` whose shutdown waits for room in a full queue."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def configure_logging() -> None:
+    """Route the application's logs through a queue flushed by a background thread.
+
+    Log calls on the request path only filter the record and put it on a
+    bounded queue; formatting and writing to stdout happen on the listener
+    thread. Records carry the current request id and are written as JSON lines,
+    or as text with ``LOG_FORMAT=text``. INFO records of the loggers listed in
+    ``LOG_SAMPLE_RATES`` are sampled. Calling it again has no effect.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "text":
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(
+        queue.Queue(maxsize=settings.LOG_QUEUE_MAX_SIZE)
+    )
+    # Module loggers set their own level, so the configured level is enforced here
+    queue_handler.setLevel(settings.LOG_LEVEL)
+    queue_handler.addFilter(
+        SamplingFilter(parse_sample_rates(settings.LOG_SAMPLE_RATES))
+    )
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+
+    _queue_handler = queue_handler
+    _listener = DrainingQueueListener(queue_handler.queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the logging thread."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def dropped_log_records() -> int:
+    """Return the number of records dropped because the log queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp):
+        """Initialize the ASGI middleware assigning an id to every request.
+
+        The id is taken from the request's `X-Request-ID` header when present,
+        and generated otherwise. It is available to log records through the
+        `request_id` context variable and echoed in the response header.
+
+        Args:
+            app (ASGIApp): The application to wrap.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode())
+        current_id = (
+            incoming.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+            if incoming
+            else uuid.uuid4().hex
+        )
+        token = request_id.set(current_id)
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.lower().encode(), current_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
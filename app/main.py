@@ -1,6 +1,22 @@
-from .config import app
+from .config import app, settings
+from .lifespan import lifespan
+from .logging_config import RequestIdMiddleware, configure_logging
+from .metrics import MetricsMiddleware
+from .routers.metrics import router as metrics_router
 from .routers.v1.customer_rentals import router as customer_rentals_router
 from .routers.v1.customers import router as customers_router
+from .routers.v1.inventory import router as inventory_router
+from .routers.v1.reports import router as reports_router
 
 app.include_router(router=customers_router, prefix="/api/v1")
 app.include_router(router=customer_rentals_router, prefix="/api/v1")
+app.include_router(router=inventory_router, prefix="/api/v1")
+app.include_router(router=reports_router, prefix="/api/v1")
+app.include_router(router=metrics_router)
+
+app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+app.add_middleware(RequestIdMiddleware)
+
+configure_logging()
+
+app.router.lifespan_context = lifespan
@@ -0,0 +1,421 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# A metric family is (name, type, help, samples), each sample being the
+# suffix appended to the name, the labels and the value
+Sample = Tuple[str, Dict[str, str], float]
+MetricFamily = Tuple[str, str, str, List[Sample]]
+
+# Seconds spent in each stage by the request currently being served
+request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = (
+    contextvars.ContextVar("request_timings", default=None)
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initialize a monotonically increasing counter, one series per label combination.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            labelnames (Sequence[str]): The names of the labels identifying a series.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the series identified by `labels` by `amount`."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current value of a series, 0 when it was never increased."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            samples = [
+                ("", dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+        return self.name, "counter", self.documentation, samples
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        """Initialize a histogram of observed values, one series per label combination.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            labelnames (Sequence[str]): The names of the labels identifying a series.
+            buckets (Sequence[float]): The upper bounds of the cumulative buckets.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: the count of each bucket, the +Inf count and the sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record a value in the series identified by `labels`."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            counts, total = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        """Return the number of values observed in a series."""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        return sum(series[0]) if series else 0
+
+    def collect(self) -> MetricFamily:
+        samples: List[Sample] = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip((*self.buckets, math.inf), counts):
+                    cumulative += count
+                    samples.append(
+                        (
+                            "_bucket",
+                            {**labels, "le": _format_value(bound)},
+                            float(cumulative),
+                        )
+                    )
+                samples.append(("_sum", labels, total[0]))
+                samples.append(("_count", labels, float(cumulative)))
+        return self.name, "histogram", self.documentation, samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Initialize a registry of metrics rendered in the Prometheus text format.
+
+        Besides counters and histograms, collectors can be registered to
+        report values that are read at scrape time, such as cache sizes.
+        """
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        counter = Counter(name, documentation, labelnames)
+        self._metrics.append(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def register_collector(
+        self, collector: Callable[[], Iterable[MetricFamily]]
+    ) -> None:
+        """Register a function returning metric families computed at scrape time."""
+        self._collectors.append(collector)
+
+    def collect(self) -> Iterator[MetricFamily]:
+        for metric in self._metrics:
+            yield metric.collect()
+        for collector in self._collectors:
+            yield from collector()
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for name, metric_type, documentation, samples in self.collect():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(
+                    f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by route.",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_ERRORS = registry.counter(
+    "http_request_errors_total",
+    "HTTP requests answered with a server error.",
+    ["method", "route"],
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds",
+    "Latency of storage queries.",
+    ["operation", "table"],
+)
+DB_QUERY_ERRORS = registry.counter(
+    "db_query_errors_total",
+    "Storage queries that raised an error.",
+    ["operation", "table"],
+)
+LLM_REQUEST_SECONDS = registry.histogram(
+    "llm_request_duration_seconds",
+    "Latency of GPT requests, including retries.",
+    ["operation"],
+)
+LLM_REQUEST_ERRORS = registry.counter(
+    "llm_request_errors_total",
+    "GPT requests that failed after their last attempt.",
+    ["operation"],
+)
+LLM_RETRIES = registry.counter(
+    "llm_retries_total",
+    "GPT request attempts retried after a transient error.",
+    ["operation"],
+)
+DISCOUNT_FALLBACKS = registry.counter(
+    "discount_fallbacks_total",
+    "Rental discounts determined by the degraded strategy after the calculation failed.",
+    ["source"],
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total",
+    "Tokens used by GPT completions, as reported by the API.",
+    ["model", "type"],
+)
+
+
+def record_request_time(stage: str, seconds: float) -> None:
+    """Add time spent in a stage to the timings of the current request."""
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def observe(
+    histogram: Histogram, errors: Counter, stage: str, **labels: str
+) -> Iterator[None]:
+    """Time the enclosed block into a histogram, counting it as an error when it raises.
+
+    The duration is also added to the `stage` timing of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        errors.inc(**labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        record_request_time(stage, elapsed)
+
+
+def instrument_query(operation: str) -> Callable[[Callable], Callable]:
+    """Decorate a storage query whose first argument is the table name."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(table: str, *args: Any, **kwargs: Any) -> Any:
+            with observe(
+                DB_QUERY_SECONDS,
+                DB_QUERY_ERRORS,
+                "db",
+                operation=operation,
+                table=table,
+            ):
+                return func(table, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_llm(operation: str) -> Callable[[Callable], Callable]:
+    """Decorate a synchronous or asynchronous GPT request."""
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with observe(
+                    LLM_REQUEST_SECONDS, LLM_REQUEST_ERRORS, "llm", operation=operation
+                ):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with observe(
+                LLM_REQUEST_SECONDS, LLM_REQUEST_ERRORS, "llm", operation=operation
+            ):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_llm_usage(response: Any) -> None:
+    """Count the prompt and completion tokens reported by a chat completion."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    model = getattr(response, "model", None) or ""
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, type="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, type="completion")
+
+
+def server_timing_header(timings: Dict[str, float], total_seconds: float) -> str:
+    """Format stage timings and the total handler time as a `Server-Timing` header."""
+    entries = [
+        f"{stage};dur={seconds * 1000:.3f}"
+        for stage, seconds in sorted(timings.items())
+    ]
+    entries.append(f"total;dur={total_seconds * 1000:.3f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of every request by route.
+
+    Requests are labelled with the route template, e.g. ``/api/v1/customers``,
+    rather than the raw path. When `server_timing` is enabled the time the
+    request spent in the database and the GPT model is reported in a
+    `Server-Timing` response header.
+    """
+
+    def __init__(self, app: Any, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timings(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    value = server_timing_header(timings, time.perf_counter() - started)
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", value.encode()),
+                        ],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            request_timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route_path,
+                status=str(status_code),
+            )
+            if status_code >= 500:
+                HTTP_REQUEST_ERRORS.inc(method=scope["method"], route=route_path)
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from app.queries import async_retrieve_query, async_retrieve_table_version
+from app.table_versions import etag_matches, table_versions, version_headers
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# Header carrying the cursor of the next page on list responses
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int, descending: bool) -> str:
+    """Encode the position after the last returned row as an opaque cursor.
+
+    Args:
+        last_id (int): The `id` of the last row of the current page.
+        descending (bool): Whether the page was ordered in descending order.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = json.dumps({"id": last_id, "desc": descending}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, descending: bool) -> int:
+    """Decode an opaque cursor into the `id` the next page starts after.
+
+    Args:
+        cursor (str): A cursor previously returned by `encode_cursor`.
+        descending (bool): The ordering requested for the next page.
+
+    Returns:
+        int: The `id` of the last row of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = int(payload["id"])
+        cursor_descending = bool(payload["desc"])
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid pagination cursor.")
+
+    if cursor_descending != descending:
+        raise ValueError("Pagination cursor does not match the requested order.")
+    return last_id
+
+
+async def retrieve_page(
+    table: str,
+    columns: List[str],
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    since: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Retrieve one keyset-paginated page of rows ordered by `id`.
+
+    Rows are ordered by their `id`, which increases with `created_at`, and the
+    next page is selected with an `id` range filter rather than an offset, so
+    every page costs the same regardless of its depth in the table.
+
+    Args:
+        table (str): The name of the table to query.
+        columns (List[str]): A list of column names to select, must include `id`.
+        filters (Optional[Dict[str, Any]]): Additional filter conditions, see `retrieve_query`.
+        limit (int): The maximum number of rows in the page.
+        cursor (Optional[str]): The cursor returned with the previous page.
+        descending (bool): Whether to return the newest rows first.
+        since (Optional[int]): Only return rows with an `id` above this one, e.g. the last `id`
+            the client has seen. Requires ascending order.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The rows of the page and the cursor of the
+        next page, or None when this is the last page.
+
+    Raises:
+        ValueError: If the cursor is invalid, or `since` is combined with descending order.
+        Exception: If an error occurs during the query execution.
+    """
+    page_filters = dict(filters or {})
+    if cursor:
+        last_id = decode_cursor(cursor, descending=descending)
+        page_filters["id__lt" if descending else "id__gt"] = last_id
+    if since is not None:
+        if descending:
+            raise ValueError("Delta requests with 'since' must use ascending order.")
+        page_filters["id__gt"] = max(since, page_filters.get("id__gt", since))
+
+    # Fetch one extra row to find out whether another page follows
+    rows = await async_retrieve_query(
+        table=table,
+        columns=columns,
+        filters=page_filters,
+        order_by="id",
+        descending=descending,
+        limit=limit + 1,
+    )
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["id"], descending=descending)
+
+
+async def conditional_list_headers(
+    table: str, query_params: List[Tuple[str, str]], if_none_match: Optional[str]
+) -> Tuple[Dict[str, str], bool]:
+    """Build the validator headers of a list response and check the client's copy.
+
+    The ETag is derived from the table's change version and the request's query
+    parameters, so it changes whenever the table is written and differs between
+    pages, filters and field selections. The version is read from the database
+    at most once every `TABLE_VERSION_TTL_SECONDS`, so most revalidations of an
+    unchanged list are answered without querying it.
+
+    Args:
+        table (str): The table the list is read from.
+        query_params (List[Tuple[str, str]]): The request's query parameters.
+        if_none_match (Optional[str]): The request's `If-None-Match` header.
+
+    Returns:
+        Tuple[Dict[str, str], bool]: The `ETag`, `Last-Modified` and `Cache-Control` response
+        headers, and whether the client's copy is current and a 304 should be sent.
+
+    Raises:
+        Exception: If the table version has to be read and the query fails.
+    """
+    version = await async_retrieve_table_version(table)
+    etag = table_versions.etag(table, version, urlencode(sorted(query_params)))
+    headers = {**version_headers(etag, version), "Cache-Control": "no-cache"}
+    return headers, etag_matches(if_none_match, etag)
@@ -1,26 +1,86 @@
+import asyncio
+import contextvars
 import logging
-from typing import Any, Dict, List, Optional, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
-from app.supabase import create_supabase_client
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import instrument_query
+from app.storage.base import StorageBackend
+from app.storage.factory import create_storage_backend
+from app.table_versions import TableVersion, table_versions
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Initialize supabase client
-supabase = create_supabase_client()
+T = TypeVar("T")
 
+# The storage backend selected in settings, created on first use or at startup
+backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
 
+# Bounded pool that runs the blocking storage calls off the event loop. All
+# workers share the storage backend, and the Supabase backend's keep-alive HTTP pool.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_MAX_WORKERS, thread_name_prefix="db"
+)
+
+
+def get_backend() -> StorageBackend:
+    """Return the storage backend, creating it on first use.
+
+    The application creates it in its lifespan hook, so importing the app
+    does not open database connections.
+    """
+    global backend
+    with _backend_lock:
+        if backend is None:
+            backend = create_storage_backend()
+        return backend
+
+
+def close_backend() -> None:
+    """Close the storage backend, a later call to `get_backend` creates a new one."""
+    global backend
+    with _backend_lock:
+        closing, backend = backend, None
+    if closing is not None:
+        closing.close()
+
+
+# Read-through cache of customer rows by id, holding the columns fetched so far
+customer_cache = TTLCache(
+    max_size=settings.CUSTOMER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.CUSTOMER_CACHE_TTL_SECONDS,
+)
+
+
+@instrument_query("retrieve_query")
 def retrieve_query(
-    table: str, columns: List[str], filters: Optional[Dict[str, Any]] = None
+    table: str,
+    columns: List[str],
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: Optional[str] = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
 ) -> Union[List[Dict[str, Any]], Exception]:
     """Retrieve Data from a Specified Table
 
-    This function retrieves data from a specified table in Supabase, allowing for optional filtering.
+    This function retrieves data from a specified table in the storage backend, allowing for optional
+    filtering, ordering and limiting. Filters, ordering and limits are pushed down to the database.
 
     Args:
         table (str): The name of the table to query.
         columns (List[str]): A list of column names to select.
-        filters (Optional[Dict[str, Any]]): A dictionary of filter conditions where the key is the column name and the value is the filter value.
+        filters (Optional[Dict[str, Any]]): A dictionary of filter conditions where the key is the column name,
+            optionally suffixed with an operator (e.g. ``rental_date__gte`` or ``id__in``), and the value is the
+            filter value. Keys without an operator filter on equality.
+        order_by (Optional[str]): The column to order the results by.
+        descending (bool): Whether to order the results in descending order.
+        limit (Optional[int]): The maximum number of rows to return.
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries representing the rows returned by the query.
@@ -29,66 +89,395 @@ def retrieve_query(
         Exception: If an error occurs during the query execution.
     """
     try:
-        # Build the base query
-        query = supabase.table(table).select(", ".join(columns))
-
-        # Apply filters if provided
-        if filters:
-            for key, value in filters.items():
-                query = query.eq(key, value)
-
-        # Execute the query and return results
-        results = query.execute()
+        # Execute the query with filters, ordering and limit applied by the backend
+        results = get_backend().select(
+            table=table,
+            columns=columns,
+            filters=filters,
+            order_by=order_by,
+            descending=descending,
+            limit=limit,
+        )
 
         # Check if results are empty and log the event
-        if not results.data:
+        if not results:
             logger.warning(
-                f"No records found in table '{table}' with filters: {filters}"
+                "No records found in table '%s' with filters: %s", table, filters
             )
 
         logger.info(
-            f"Successfully retrieved {len(results.data)} records from table '{table}'."
+            "Successfully retrieved %s records from table '%s'.", len(results), table
         )
-        return results.data
+        return results
 
     except Exception as e:
         # Log the error with details
         logger.error(
-            f"An error occurred during the retrieve operation in table '{table}': {e}"
+            "An error occurred during the retrieve operation in table '%s': %s",
+            table,
+            e,
         )
         # Raise a more informative exception
         raise Exception(f"Failed to retrieve data from table '{table}': {str(e)}")
 
 
+def invalidate_cached_rows(table: str, rows: List[Dict[str, Any]]) -> None:
+    """Drop written rows from the read-through caches and bump the table's version.
+
+    Args:
+        table (str): The table the rows were written to.
+        rows (List[Dict[str, Any]]): The inserted or updated rows.
+    """
+    if rows:
+        table_versions.bump(table)
+    if table != "customers":
+        return
+    for row in rows or []:
+        if "id" in row:
+            customer_cache.delete(row["id"])
+
+
+def _cached_customers(
+    customer_ids: List[int], columns: List[str]
+) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+    # Split the ids into customers with every requested column cached and the rest
+    customers: Dict[int, Dict[str, Any]] = {}
+    missing_ids: List[int] = []
+    for customer_id in dict.fromkeys(customer_ids):
+        cached = customer_cache.get(customer_id, None)
+        if cached is not None and all(column in cached for column in columns):
+            customers[customer_id] = {column: cached[column] for column in columns}
+        else:
+            missing_ids.append(customer_id)
+    return customers, missing_ids
+
+
+def _fetch_customers(
+    customer_ids: List[int], columns: List[str]
+) -> Dict[int, Dict[str, Any]]:
+    # Fetch customers with a single query and merge their columns into the cache
+    filters = (
+        {"id": customer_ids[0]} if len(customer_ids) == 1 else {"id__in": customer_ids}
+    )
+    customers: Dict[int, Dict[str, Any]] = {}
+    for row in retrieve_query(table="customers", columns=columns, filters=filters):
+        cached = customer_cache.get(row["id"], None) or {}
+        customer_cache.set(row["id"], {**cached, **row})
+        customers[row["id"]] = row
+    return customers
+
+
+def retrieve_customers(
+    customer_ids: List[int], columns: List[str]
+) -> Dict[int, Dict[str, Any]]:
+    """Retrieve customers by id through the read-through customer cache.
+
+    Customers whose requested columns are all cached are served from memory.
+    The others are fetched with a single query that selects only the requested
+    columns, and the fetched columns are merged into the cache. Cached customers
+    are dropped when they are written through `create_query`, `bulk_create_query`
+    or `update_query`, and expire after `settings.CUSTOMER_CACHE_TTL_SECONDS`.
+
+    Args:
+        customer_ids (List[int]): The ids of the customers to retrieve.
+        columns (List[str]): The columns the caller needs, `id` is always included.
+
+    Returns:
+        Dict[int, Dict[str, Any]]: The found customers by id, with the requested columns.
+
+    Raises:
+        Exception: If an error occurs during the query execution.
+    """
+    columns = list(dict.fromkeys(["id", *columns]))
+    customers, missing_ids = _cached_customers(customer_ids, columns)
+    if missing_ids:
+        customers.update(_fetch_customers(missing_ids, columns))
+    return customers
+
+
+@instrument_query("create_query")
 def create_query(
     table: str, data: Dict[str, Any]
 ) -> Union[List[Dict[str, Any]], Exception]:
-    """Inserts data into a specified table in Supabase.
+    """Inserts data into a specified table in the storage backend.
 
     Args:
-        table (str): The name of the Supabase table where data will be inserted.
+        table (str): The name of the table where data will be inserted.
         data (dict): A dictionary representing the data to insert into the table.
 
     Returns:
-        dict: The response from Supabase containing the result of the insert operation.
+        List[Dict[str, Any]]: The inserted rows, as stored by the backend.
 
     Raises:
         ValueError: If the `table` name or `data` dictionary is invalid.
-        Exception: If an error occurs during the Supabase insert operation.
+        Exception: If an error occurs during the insert operation.
     """
-    # Log the beginning of the insert operation
-    logger.info(f"Starting insert operation in table '{table}' with data: {data}")
+    # Log the beginning of the insert operation, without the row's values as they may hold personal data
+    logger.info("Starting insert operation in table '%s'.", table)
 
     try:
         # Execute the insert query
-        response = supabase.table(table).insert(data).execute()
+        created_rows = get_backend().insert(table=table, rows=[data])
 
         # Log successful insertion
-        logger.info(f"Successfully inserted data into table '{table}': {response.data}")
-        return response.data
+        logger.info(
+            "Successfully inserted %s rows into table '%s'.", len(created_rows), table
+        )
+        invalidate_cached_rows(table, created_rows)
+        return created_rows
+
+    except Exception as e:
+        logger.error(
+            "An error occurred during insert operation in table '%s': %s", table, e
+        )
+        raise Exception(e.__dict__.get("message") or str(e))
+
+
+@instrument_query("bulk_create_query")
+def bulk_create_query(table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Inserts many rows into a specified table with a single multi-row insert.
+
+    Args:
+        table (str): The name of the table where data will be inserted.
+        rows (List[Dict[str, Any]]): The rows to insert, all with the same keys.
+
+    Returns:
+        List[Dict[str, Any]]: The inserted rows, in the order they were given.
+
+    Raises:
+        Exception: If an error occurs during the insert operation.
+    """
+    if not rows:
+        return []
+
+    logger.info("Starting bulk insert of %s rows in table '%s'.", len(rows), table)
+
+    try:
+        created_rows = get_backend().insert(table=table, rows=rows)
+
+        logger.info(
+            "Successfully inserted %s rows into table '%s'.", len(created_rows), table
+        )
+        invalidate_cached_rows(table, created_rows)
+        return created_rows
 
     except Exception as e:
         logger.error(
-            f"An error occurred during insert operation in table '{table}': {e}"
+            "An error occurred during bulk insert operation in table '%s': %s", table, e
+        )
+        raise Exception(e.__dict__.get("message") or str(e))
+
+
+@instrument_query("update_query")
+def update_query(
+    table: str, data: Dict[str, Any], filters: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Updates the rows of a specified table that match the given filters.
+
+    Args:
+        table (str): The name of the table to update.
+        data (Dict[str, Any]): The column values to set.
+        filters (Dict[str, Any]): The filter conditions selecting the rows, see `retrieve_query`.
+
+    Returns:
+        List[Dict[str, Any]]: The updated rows.
+
+    Raises:
+        ValueError: If no filters are given.
+        Exception: If an error occurs during the update operation.
+    """
+    if not filters:
+        raise ValueError("Refusing to update every row of a table without filters.")
+
+    try:
+        updated_rows = get_backend().update(table=table, data=data, filters=filters)
+
+        logger.info(
+            "Successfully updated %s rows in table '%s'.", len(updated_rows), table
+        )
+        invalidate_cached_rows(table, updated_rows)
+        return updated_rows
+
+    except Exception as e:
+        logger.error(
+            "An error occurred during update operation in table '%s': %s", table, e
+        )
+        raise Exception(e.__dict__.get("message") or str(e))
+
+
+async def run_in_db_executor(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking storage call on the bounded database thread pool.
+
+    The caller's context variables are copied into the worker thread, so
+    per-request state such as timings and request ids follows the call.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, partial(context.run, func, *args))
+
+
+async def async_retrieve_query(
+    table: str,
+    columns: List[str],
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: Optional[str] = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Retrieve data from a specified table without blocking the event loop.
+
+    Runs `retrieve_query` on the bounded database thread pool.
+
+    Args:
+        table (str): The name of the table to query.
+        columns (List[str]): A list of column names to select.
+        filters (Optional[Dict[str, Any]]): A dictionary of filter conditions, see `retrieve_query`.
+        order_by (Optional[str]): The column to order the results by.
+        descending (bool): Whether to order the results in descending order.
+        limit (Optional[int]): The maximum number of rows to return.
+
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries representing the rows returned by the query.
+
+    Raises:
+        Exception: If an error occurs during the query execution.
+    """
+    return await run_in_db_executor(
+        retrieve_query, table, columns, filters, order_by, descending, limit
+    )
+
+
+async def async_create_query(table: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Insert data into a specified table without blocking the event loop.
+
+    Runs `create_query` on the bounded database thread pool.
+
+    Args:
+        table (str): The name of the table where data will be inserted.
+        data (dict): A dictionary representing the data to insert into the table.
+
+    Returns:
+        List[Dict[str, Any]]: The rows created by the insert operation.
+
+    Raises:
+        Exception: If an error occurs during the insert operation.
+    """
+    return await run_in_db_executor(create_query, table, data)
+
+
+async def async_bulk_create_query(
+    table: str, rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Insert many rows into a specified table without blocking the event loop.
+
+    Runs `bulk_create_query` on the bounded database thread pool.
+
+    Args:
+        table (str): The name of the table where data will be inserted.
+        rows (List[Dict[str, Any]]): The rows to insert, all with the same keys.
+
+    Returns:
+        List[Dict[str, Any]]: The inserted rows, in the order they were given.
+
+    Raises:
+        Exception: If an error occurs during the insert operation.
+    """
+    return await run_in_db_executor(bulk_create_query, table, rows)
+
+
+async def async_update_query(
+    table: str, data: Dict[str, Any], filters: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Update rows of a specified table without blocking the event loop.
+
+    Runs `update_query` on the bounded database thread pool.
+
+    Args:
+        table (str): The name of the table to update.
+        data (Dict[str, Any]): The column values to set.
+        filters (Dict[str, Any]): The filter conditions selecting the rows, see `retrieve_query`.
+
+    Returns:
+        List[Dict[str, Any]]: The updated rows.
+
+    Raises:
+        Exception: If an error occurs during the update operation.
+    """
+    return await run_in_db_executor(update_query, table, data, filters)
+
+
+@instrument_query("retrieve_table_version")
+def retrieve_table_version(table: str) -> TableVersion:
+    """Derive the change version of a table from its newest row and row count.
+
+    Args:
+        table (str): The name of the table.
+
+    Returns:
+        TableVersion: The table's current version, see `app.table_versions`.
+
+    Raises:
+        Exception: If the table cannot be read.
+    """
+    try:
+        latest_rows = get_backend().select(
+            table=table,
+            columns=["id", "created_at"],
+            order_by="id",
+            descending=True,
+            limit=1,
+        )
+        rows = get_backend().count(table)
+    except Exception as e:
+        logger.error("Failed to read the version of table '%s': %s", table, e)
+        raise Exception(f"Failed to read the version of table '{table}': {str(e)}")
+
+    return table_versions.observe(table, latest_rows[0] if latest_rows else None, rows)
+
+
+async def async_retrieve_table_version(table: str) -> TableVersion:
+    """Return the change version of a table, see `app.table_versions`.
+
+    A version read within the last `TABLE_VERSION_TTL_SECONDS` is answered from
+    memory; otherwise it is derived from the data on the database thread pool.
+
+    Args:
+        table (str): The name of the table.
+
+    Returns:
+        TableVersion: The table's current version.
+
+    Raises:
+        Exception: If the table cannot be read.
+    """
+    version = table_versions.get(table)
+    if version is not None:
+        return version
+    return await run_in_db_executor(retrieve_table_version, table)
+
+
+async def async_retrieve_customers(
+    customer_ids: List[int], columns: List[str]
+) -> Dict[int, Dict[str, Any]]:
+    """Retrieve customers by id through the read-through customer cache without blocking.
+
+    Cache hits are answered on the event loop; only misses are fetched on the
+    bounded database thread pool. See `retrieve_customers`.
+
+    Args:
+        customer_ids (List[int]): The ids of the customers to retrieve.
+        columns (List[str]): The columns the caller needs, `id` is always included.
+
+    Returns:
+        Dict[int, Dict[str, Any]]: The found customers by id, with the requested columns.
+
+    Raises:
+        Exception: If an error occurs during the query execution.
+    """
+    columns = list(dict.fromkeys(["id", *columns]))
+    customers, missing_ids = _cached_customers(customer_ids, columns)
+    if missing_ids:
+        customers.update(
+            await run_in_db_executor(_fetch_customers, missing_ids, columns)
         )
-        raise Exception(e.__dict__.get("message"))
+    return customers
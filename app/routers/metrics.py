@@ -0,0 +1,156 @@
+import logging
+from typing import List
+
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.ai.gpt import services as gpt_services
+from app.circuit_breaker import CIRCUIT_STATES
+from app.idempotency import idempotency_store
+from app.logging_config import dropped_log_records
+from app.metrics import PROMETHEUS_CONTENT_TYPE, MetricFamily, registry
+from app.queries import customer_cache
+from app.services.discount_cache import discount_cache, discount_flights
+from app.services.rental_jobs import rental_job_queue
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter(tags=["Metrics"])
+
+
+def collect_component_metrics() -> List[MetricFamily]:
+    """Read the counters kept by the in-process components.
+
+    Covers the caches, the single-flight group, the GPT batcher, the LLM
+    circuit breaker, the log queue and the rental queue.
+
+    Returns:
+        List[MetricFamily]: The metric families to render alongside the registry's.
+    """
+    caches = {
+        "customer": customer_cache.stats(),
+        "discount": discount_cache.stats(),
+        "idempotency": idempotency_store.responses.stats(),
+    }
+    families: List[MetricFamily] = [
+        (
+            "cache_entries",
+            "gauge",
+            "Entries held by an in-process cache.",
+            [("", {"cache": name}, stats["size"]) for name, stats in caches.items()],
+        )
+    ]
+    for counter in ("hits", "misses", "evictions", "expirations"):
+        families.append(
+            (
+                f"cache_{counter}_total",
+                "counter",
+                f"Cache {counter} of an in-process cache.",
+                [
+                    ("", {"cache": name}, stats[counter])
+                    for name, stats in caches.items()
+                ],
+            )
+        )
+
+    flights = discount_flights.stats()
+    families.append(
+        (
+            "discount_flights_coalesced_total",
+            "counter",
+            "Discount calculations that joined an identical calculation in flight.",
+            [("", {}, flights["coalesced"])],
+        )
+    )
+
+    if gpt_services.gpt_batcher is not None:
+        batcher = gpt_services.gpt_batcher.stats()
+        families.append(
+            (
+                "llm_batches_total",
+                "counter",
+                "Micro-batched GPT completions sent.",
+                [("", {}, batcher["batches"])],
+            )
+        )
+        families.append(
+            (
+                "llm_batched_prompts_total",
+                "counter",
+                "Prompts sent through the GPT micro-batcher.",
+                [("", {}, batcher["prompts"])],
+            )
+        )
+
+    breaker = gpt_services.llm_circuit_breaker.stats()
+    families.append(
+        (
+            "llm_circuit_state",
+            "gauge",
+            "State of the LLM circuit breaker, 1 for the current state.",
+            [
+                ("", {"state": state}, int(state == breaker["state"]))
+                for state in CIRCUIT_STATES
+            ],
+        )
+    )
+    families.append(
+        (
+            "llm_circuit_opened_total",
+            "counter",
+            "Times the LLM circuit breaker opened.",
+            [("", {}, breaker["opened"])],
+        )
+    )
+    families.append(
+        (
+            "llm_circuit_rejections_total",
+            "counter",
+            "LLM calls rejected by the circuit breaker without being sent.",
+            [
+                ("", {"reason": reason}, count)
+                for reason, count in breaker["rejected"].items()
+            ],
+        )
+    )
+    families.append(
+        (
+            "llm_pending_calls",
+            "gauge",
+            "LLM discount calls in flight through the circuit breaker.",
+            [("", {}, breaker["pending"])],
+        )
+    )
+
+    families.append(
+        (
+            "log_records_dropped_total",
+            "counter",
+            "Log records dropped because the logging queue was full.",
+            [("", {}, dropped_log_records())],
+        )
+    )
+
+    families.append(
+        (
+            "rental_queue_depth",
+            "gauge",
+            "Rental jobs waiting for a worker.",
+            [("", {}, rental_job_queue.depth())],
+        )
+    )
+    return families
+
+
+registry.register_collector(collect_component_metrics)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """**Expose the service metrics in the Prometheus text format.**
+
+    Includes request, database and GPT latency histograms, error counts, GPT
+    token usage and the state of the in-process caches and queues.
+    """
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
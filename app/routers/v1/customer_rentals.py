@@ -1,24 +1,110 @@
+import datetime
 import logging
-from typing import List, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from starlette import status
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
-from app.queries import retrieve_query
-from app.schema import CustomerRentalsResponseSchema, CustomerRentalsSchema
-from app.services.customer_rentals_services import create_customer_rental_service
+from app.config import settings
+from app.exports import export_response
+from app.idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    IdempotencyKeyMismatchError,
+    idempotency_store,
+    request_fingerprint,
+)
+from app.pagination import (
+    DEFAULT_PAGE_LIMIT,
+    MAX_PAGE_LIMIT,
+    NEXT_CURSOR_HEADER,
+    conditional_list_headers,
+    retrieve_page,
+)
+from app.schema import (
+    CustomerRentalBatchResultSchema,
+    CustomerRentalsResponseSchema,
+    CustomerRentalsSchema,
+    RentalJobSchema,
+)
+from app.serialization import RowsResponse, resolve_fields
+from app.services.customer_rentals_services import (
+    create_customer_rental_service,
+    create_customer_rentals_batch_service,
+)
+from app.services.inventory import ShoeSizeUnavailableError
+from app.services.rental_jobs import RentalQueueFullError, rental_job_queue
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 router = APIRouter(tags=["Customer Rentals v1"])
 
+CUSTOMER_RENTAL_COLUMNS = [
+    "id",
+    "created_at",
+    "customer_id",
+    "rental_date",
+    "shoe_size",
+    "rental_fee",
+    "discount",
+    "total_fee",
+    "discount_source",
+]
+
+
+async def _create_customer_rental(
+    payload: CustomerRentalsSchema, asynchronous: bool
+) -> JSONResponse:
+    """Create or queue a customer rental, see `create_customer_rental`."""
+    if asynchronous:
+        try:
+            job = rental_job_queue.enqueue(payload)
+        except RentalQueueFullError as e:
+            logger.warning("Rejected customer rental: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "1"},
+            )
+
+        logger.info("Queued customer rental as job %s.", job["id"])
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=job,
+            headers={"Location": f"/api/v1/customer/rentals/jobs/{job['id']}"},
+        )
+
+    try:
+        logger.info("Request received to create a new customer rental.")
+
+        # Call the service to create the customer rental entry
+        created_rental = await create_customer_rental_service(payload=payload)
+
+        logger.info(
+            "Successfully created customer rental with ID: %s", created_rental[0]["id"]
+        )
+
+        # Return JSON response with status 201 and created rental data
+        return JSONResponse(status_code=status.HTTP_201_CREATED, content=created_rental)
+
+    except ShoeSizeUnavailableError as e:
+        logger.warning("Rejected customer rental: %s", e)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error("Error while creating customer rental: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred while creating the customer: {str(e)}",
+        )
+
 
 @router.post("/customer/rentals/", response_model=List[CustomerRentalsResponseSchema])
 async def create_customer_rental(
     payload: CustomerRentalsSchema,
-) -> Union[JSONResponse, HTTPException]:
+    asynchronous: bool = Query(False, alias="async"),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
+) -> Union[Response, HTTPException]:
     """**Create a new customer rental entry in the database.**
 
     **Args**:
@@ -26,72 +112,241 @@ async def create_customer_rental(
         - **customer_id (int)**: ID of the customer.
         - **shoe_size (int)**: Size of the shoe.
         - **rental_fee (float)**: Fee of the rental.
+    - **async (bool)**: Queue the rental and respond immediately instead of waiting for it to be created.
+    - **Idempotency-Key (header)**: Optional client-chosen key identifying the rental. A retry with the same
+      key and payload gets the stored response back, marked with `Idempotent-Replayed: true`, instead of
+      creating another rental; a retry sent while the first request is running waits for its response.
 
     **Returns**:
-    - **JSONResponse**: JSON response with created customer rental entry.
+    - **JSONResponse**: JSON response with created customer rental entry, or with `async=true` a
+      `202 Accepted` response with the queued job, whose status is available at the URL in the
+      `Location` header.
 
     **Raises**:
-    - **HTTPException**: If an error occurs during the creation process.
+    - **HTTPException**: If the idempotency key was used for a different rental (422), the shoe size is
+      out of stock (409), the rental queue is full (503) or an error occurs during the creation process.
     """
+    if idempotency_key is None:
+        return await _create_customer_rental(payload, asynchronous)
+
     try:
-        logger.info("Request received to create a new customer rental.")
+        return await idempotency_store.run(
+            scope="create_customer_rental",
+            key=idempotency_key,
+            fingerprint=request_fingerprint(
+                payload.model_dump_json(), str(asynchronous)
+            ),
+            handler=lambda: _create_customer_rental(payload, asynchronous),
+        )
+    except IdempotencyKeyMismatchError as e:
+        logger.warning("Rejected customer rental: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
 
-        # Call the service to create the customer rental entry
-        created_rental = await create_customer_rental_service(payload=payload)
 
-        logger.info(
-            f"Successfully created customer rental with ID: {created_rental[0]['id']}"
+@router.post(
+    "/customer/rentals/batch", response_model=List[CustomerRentalBatchResultSchema]
+)
+async def create_customer_rentals_batch(
+    payloads: List[CustomerRentalsSchema],
+) -> Union[JSONResponse, HTTPException]:
+    """**Create many customer rental entries at once.**
+
+    All referenced customers are looked up with one query, discounts are calculated
+    concurrently and the rentals are inserted with one multi-row insert.
+
+    **Args**:
+    - **payloads (List[CustomerRentalsSchema])**: The customer rentals to create.
+
+    **Returns**:
+    - **JSONResponse**: One result per rental, in request order, with `index`, `success`,
+      the created `rental` and an `error` message for rentals that failed. The status is
+      `201` when every rental was created and `207` otherwise.
+
+    **Raises**:
+    - **HTTPException**: If the batch is too large or the customer lookup fails.
+    """
+    if len(payloads) > settings.RENTAL_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {settings.RENTAL_BATCH_MAX_SIZE} rentals.",
         )
 
-        # Return JSON response with status 201 and created rental data
-        return JSONResponse(status_code=status.HTTP_201_CREATED, content=created_rental)
+    try:
+        logger.info("Request received to create %s customer rentals.", len(payloads))
+
+        results = await create_customer_rentals_batch_service(payloads=payloads)
+
+        all_created = all(result["success"] for result in results)
+        return JSONResponse(
+            status_code=(
+                status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS
+            ),
+            content=results,
+        )
 
     except Exception as e:
-        logger.error(f"Error while creating customer rental: {e}")
+        logger.error("Error while creating customer rentals batch: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An unexpected error occurred while creating the customer: {str(e)}",
+            detail=f"An unexpected error occurred while creating the customer rentals: {str(e)}",
+        )
+
+
+@router.get("/customer/rentals/jobs/{job_id}", response_model=RentalJobSchema)
+async def get_customer_rental_job(job_id: str) -> Union[JSONResponse, HTTPException]:
+    """**Retrieve the status of a queued customer rental.**
+
+    **Args**:
+    - **job_id (str)**: ID of the job returned when the rental was queued.
+
+    **Returns**:
+    - **JSONResponse**: The job with its `status` (`queued`, `running`, `succeeded` or `failed`),
+      the created `rental` once it succeeded and the `error` if it failed.
+
+    **Raises**:
+    - **HTTPException**: If the job is unknown or has expired (404).
+    """
+    job = rental_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Rental job not found."
         )
 
+    return JSONResponse(status_code=status.HTTP_200_OK, content=job)
+
 
 @router.get("/customer/rentals/", response_model=List[CustomerRentalsResponseSchema])
-async def get_customer_rentals() -> Union[JSONResponse, HTTPException]:
+async def get_customer_rentals(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+    fields: Optional[str] = None,
+    customer_id: Optional[int] = None,
+    shoe_size: Optional[int] = None,
+    rental_date_from: Optional[datetime.date] = None,
+    rental_date_to: Optional[datetime.date] = None,
+    since: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+) -> Union[JSONResponse, Response, HTTPException]:
     """**Retrieve a list of customer rentals from the database.**
 
+    Rentals are returned one page at a time, ordered by `id`, and all filters are applied by the database.
+
+    Responses carry `ETag` and `Last-Modified` headers derived from the table's change version.
+    A request whose `If-None-Match` header matches the current `ETag` is answered with `304 Not Modified`
+    without querying the database.
+
+    **Query Parameters**:
+    - **limit (int)**: Maximum number of rentals to return (1-1000, default 100).
+    - **cursor (str)**: Opaque cursor from the `X-Next-Cursor` header of the previous page.
+    - **order (str)**: `asc` for oldest rentals first, `desc` for newest first.
+    - **customer_id (int)**: Only return rentals of this customer.
+    - **shoe_size (int)**: Only return rentals of this shoe size.
+    - **rental_date_from (date)**: Only return rentals on or after this date.
+    - **rental_date_to (date)**: Only return rentals on or before this date.
+    - **fields (str)**: Comma-separated fields to return, e.g. `id,shoe_size,total_fee`. All fields by default.
+    - **since (int)**: Only return rentals created after the rental with this `id`, e.g. the last one
+      the client has seen. Requires `asc` order.
+
     **Returns**:
     - **JSONResponse**: JSON response containing the list of customer rentals.
+      The `X-Next-Cursor` response header is set when more rentals are available.
 
     **Raises**:
-    - **HTTPException**: If an error occurs during the retrieval process.
+    - **HTTPException**: If the cursor or a field is invalid, `since` is used with `desc` order,
+      or an error occurs during the retrieval process.
     """
     try:
         logger.info("Request received to retrieve the list of customer rentals.")
 
-        # Fetch customer rental data from the database
-        customer_rentals = retrieve_query(
+        # Answer unchanged lists from the in-memory table version
+        headers, not_modified = await conditional_list_headers(
+            "customer_rentals", request.query_params.multi_items(), if_none_match
+        )
+        if not_modified:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        filters: Dict[str, Any] = {}
+        if customer_id is not None:
+            filters["customer_id"] = customer_id
+        if shoe_size is not None:
+            filters["shoe_size"] = shoe_size
+        if rental_date_from is not None:
+            filters["rental_date__gte"] = rental_date_from.isoformat()
+        if rental_date_to is not None:
+            filters["rental_date__lte"] = rental_date_to.isoformat()
+
+        # Only the requested fields are fetched and encoded
+        columns = resolve_fields(CustomerRentalsResponseSchema, fields)
+
+        # Fetch one page of customer rental data from the database
+        customer_rentals, next_cursor = await retrieve_page(
             table="customer_rentals",
-            columns=[
-                "id",
-                "created_at",
-                "customer_id",
-                "rental_date",
-                "shoe_size",
-                "rental_fee",
-                "discount",
-                "total_fee",
-            ],
+            columns=columns,
+            filters=filters,
+            limit=limit,
+            cursor=cursor,
+            descending=order == "desc",
+            since=since,
         )
 
         logger.info(
-            f"Successfully retrieved {len(customer_rentals)} customer rental records."
+            "Successfully retrieved %s customer rental records.", len(customer_rentals)
         )
 
         # Return JSON response with retrieved customer rental records
-        return JSONResponse(status_code=status.HTTP_200_OK, content=customer_rentals)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return RowsResponse(
+            customer_rentals,
+            model=CustomerRentalsResponseSchema,
+            fields=columns,
+            headers=headers,
+        )
 
+    except ValueError as ve:
+        logger.warning("Invalid customer rental list request: %s", ve)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
-        logger.error(f"Error while retrieving customer rental list: {e}")
+        logger.error("Error while retrieving customer rental list: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred while retrieving the customer: {str(e)}",
         )
+
+
+@router.get("/customer/rentals/export")
+async def export_customer_rentals(
+    format: Literal["ndjson", "csv"] = "ndjson",
+) -> StreamingResponse:
+    """**Export the full customer rentals history as a stream.**
+
+    Rentals are fetched page by page and streamed to the client as they arrive, so memory use
+    stays constant regardless of the size of the table.
+
+    **Query Parameters**:
+    - **format (str)**: `ndjson` for one JSON object per line, `csv` for comma-separated values.
+
+    **Returns**:
+    - **StreamingResponse**: The customer rentals ordered by `id`.
+
+    **Raises**:
+    - **HTTPException**: If the export cannot be started.
+    """
+    try:
+        logger.info("Request received to export customer rentals as %s.", format)
+        return export_response(
+            table="customer_rentals",
+            columns=CUSTOMER_RENTAL_COLUMNS,
+            export_format=format,
+        )
+
+    except Exception as e:
+        logger.error("Error while exporting customer rentals: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred while exporting customer rentals: {str(e)}",
+        )
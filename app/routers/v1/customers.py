@@ -1,22 +1,50 @@
 import logging
-from typing import List, Union
+from typing import List, Literal, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Query, Request
 from starlette import status
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
-from app.queries import create_query, retrieve_query
-from app.schema import CustomerResponseSchema, CustomerSchema
+from app.exports import export_response
+from app.pagination import (
+    DEFAULT_PAGE_LIMIT,
+    MAX_PAGE_LIMIT,
+    NEXT_CURSOR_HEADER,
+    conditional_list_headers,
+    retrieve_page,
+)
+from app.queries import async_create_query
+from app.schema import (
+    CustomerImportSummarySchema,
+    CustomerResponseSchema,
+    CustomerSchema,
+)
+from app.serialization import RowsResponse, resolve_fields
+from app.services.customer_import_services import import_customers_service
+from app.services.customer_rentals_services import (
+    precompute_customer_discount_service,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 router = APIRouter(tags=["Customers v1"])
 
+CUSTOMER_COLUMNS = [
+    "id",
+    "created_at",
+    "name",
+    "age",
+    "contact_info",
+    "is_disabled",
+    "medical_conditions",
+]
+
 
 @router.post("/customers", response_model=List[CustomerResponseSchema])
 async def create_customer(
     payload: CustomerSchema,
+    background_tasks: BackgroundTasks,
 ) -> Union[JSONResponse, HTTPException]:
     """**Create a new customer entry.**
 
@@ -32,6 +60,9 @@ async def create_customer(
             - **address (str)**: Address of the customer.
         - **is_disabled (bool)**: Whether the customer is disabled.
         - **medical_conditions (Optional[List[str]])**: List of medical conditions for the customer.
+    The customer's rental discount is calculated in the background after the response is sent and
+    stored on the customer, so rentals do not have to calculate it.
+
     **Returns**:
     - **201 Created**: Returns a JSON object with the created customer's data upon successful creation.
     - **500 Internal Server Error**: An error response if customer creation fails.
@@ -40,10 +71,12 @@ async def create_customer(
     - **HTTPException (500)**: If an unexpected error occurs during the creation process.
     """
     try:
-        logger.info(f"Attempting to create a customer with data: {payload}")
+        logger.info("Request received to create a new customer.")
 
         # Create the customer entry in the specified table
-        customer = create_query(table="customers", data=payload.model_dump())
+        customer = await async_create_query(
+            table="customers", data=payload.model_dump()
+        )
 
         if not customer:
             raise HTTPException(
@@ -51,55 +84,174 @@ async def create_customer(
                 detail="Customer creation failed.",
             )
 
-        logger.info(f"Customer created successfully: {customer}")
-        return JSONResponse(status_code=status.HTTP_201_CREATED, content=customer)
+        logger.info("Created customer with ID: %s", customer[0]["id"])
+        background_tasks.add_task(precompute_customer_discount_service, customer[0])
+
+        # The stored discount columns are internal and not yet set at this point
+        content = [
+            {column: row.get(column) for column in CUSTOMER_COLUMNS} for row in customer
+        ]
+        return JSONResponse(status_code=status.HTTP_201_CREATED, content=content)
     except Exception as e:
-        logger.error(f"Error while creating customer: {e}")
+        logger.error("Error while creating customer: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred while creating the customer: {str(e)}",
         )
 
 
+@router.post("/customers/import", response_model=CustomerImportSummarySchema)
+async def import_customers(
+    request: Request,
+    format: Literal["csv", "ndjson"] = "csv",
+    chunk_size: Optional[int] = Query(None, ge=1, le=5000),
+) -> Union[JSONResponse, HTTPException]:
+    """**Bulk import customers from a CSV or NDJSON file.**
+
+    The request body is the raw file, which is read as a stream. Each row is validated against
+    `CustomerSchema` and valid rows are inserted in chunks, so files of any size can be imported.
+
+    **Query Parameters**:
+    - **format (str)**: `csv` or `ndjson`.
+        - **csv**: A header row with `name`, `age`, `is_disabled`, `medical_conditions`
+          (separated by `;`), `contact_number`, `email_address` and `address`.
+        - **ndjson**: One `CustomerSchema` JSON object per line.
+    - **chunk_size (int)**: Customers inserted per query, defaults to `CUSTOMER_IMPORT_CHUNK_SIZE`.
+
+    **Returns**:
+    - **200 OK**: A summary with the number of `accepted` and `rejected` rows and the line
+      number and reason of each rejected row.
+
+    **Raises**:
+    - **HTTPException (400)**: If the CSV header is invalid.
+    - **HTTPException (500)**: If an unexpected error occurs during the import.
+    """
+    try:
+        logger.info("Request received to import customers from %s.", format)
+
+        summary = await import_customers_service(
+            chunks=request.stream(), import_format=format, chunk_size=chunk_size
+        )
+        return JSONResponse(status_code=status.HTTP_200_OK, content=summary)
+
+    except ValueError as ve:
+        logger.warning("Invalid customer import: %s", ve)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        logger.error("Error while importing customers: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred while importing customers: {str(e)}",
+        )
+
+
 @router.get("/customers", response_model=List[CustomerResponseSchema])
-async def get_customers_list() -> Union[JSONResponse, HTTPException]:
+async def get_customers_list(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+    fields: Optional[str] = None,
+    since: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+) -> Union[JSONResponse, Response, HTTPException]:
     """**Retrieve a List of Customers**
 
-    This endpoint retrieves a list of customers from the `customers` table.
+    This endpoint retrieves a page of customers from the `customers` table, ordered by `id`.
+
+    Responses carry `ETag` and `Last-Modified` headers derived from the table's change version.
+    A request whose `If-None-Match` header matches the current `ETag` is answered with `304 Not Modified`
+    without querying the database.
+
+    **Query Parameters**:
+    - **limit (int)**: Maximum number of customers to return (1-1000, default 100).
+    - **cursor (str)**: Opaque cursor from the `X-Next-Cursor` header of the previous page.
+    - **order (str)**: `asc` for oldest customers first, `desc` for newest first.
+    - **fields (str)**: Comma-separated fields to return, e.g. `id,name,age`. All fields by default.
+    - **since (int)**: Only return customers created after the customer with this `id`, e.g. the last one
+      the client has seen. Requires `asc` order.
 
     **Returns**:
     - List[Dict[str, Any]]: A list of customer records, each represented as a dictionary.
+      The `X-Next-Cursor` response header is set when more customers are available.
 
     **Raises**:
+    - HTTPException (400): If the cursor or a requested field is invalid, or `since` is used with `desc` order.
     - HTTPException (500): If an unexpected error occurs while retrieving the customer list.
     """
     try:
         logger.info("Request received to retrieve the customers list.")
 
-        # Call the retrieve_query function to fetch customer data
-        customers = retrieve_query(
+        # Answer unchanged lists from the in-memory table version
+        headers, not_modified = await conditional_list_headers(
+            "customers", request.query_params.multi_items(), if_none_match
+        )
+        if not_modified:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        # Only the requested fields are fetched and encoded
+        columns = resolve_fields(CustomerResponseSchema, fields)
+
+        # Fetch one page of customer data
+        customers, next_cursor = await retrieve_page(
             table="customers",
-            columns=[
-                "id",
-                "created_at",
-                "name",
-                "age",
-                "contact_info",
-                "is_disabled",
-                "medical_conditions",
-            ],
+            columns=columns,
+            limit=limit,
+            cursor=cursor,
+            descending=order == "desc",
+            since=since,
         )
 
-        logger.info(f"Successfully retrieved {len(customers)} customer records.")
+        logger.info("Successfully retrieved %s customer records.", len(customers))
 
         # Return the retrieved customer records
-        return JSONResponse(status_code=status.HTTP_200_OK, content=customers)
+        if next_cursor:
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        return RowsResponse(
+            customers, model=CustomerResponseSchema, fields=columns, headers=headers
+        )
 
+    except ValueError as ve:
+        logger.warning("Invalid customer list request: %s", ve)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except Exception as e:
         # Log the error with a clear message
-        logger.error(f"Error while retrieving customer list: {e}")
+        logger.error("Error while retrieving customer list: %s", e)
         # Raise an HTTP exception with a 500 status code and error details
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred while retrieving customer list: {str(e)}",
         )
+
+
+@router.get("/customers/export")
+async def export_customers(
+    format: Literal["ndjson", "csv"] = "ndjson",
+) -> StreamingResponse:
+    """**Export all customers as a stream.**
+
+    Customers are fetched page by page and streamed to the client as they arrive, so memory use
+    stays constant regardless of the size of the table. In CSV exports `contact_info` and
+    `medical_conditions` are written as JSON.
+
+    **Query Parameters**:
+    - **format (str)**: `ndjson` for one JSON object per line, `csv` for comma-separated values.
+
+    **Returns**:
+    - StreamingResponse: The customers ordered by `id`.
+
+    **Raises**:
+    - HTTPException (500): If the export cannot be started.
+    """
+    try:
+        logger.info("Request received to export customers as %s.", format)
+        return export_response(
+            table="customers", columns=CUSTOMER_COLUMNS, export_format=format
+        )
+
+    except Exception as e:
+        logger.error("Error while exporting customers: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred while exporting customers: {str(e)}",
+        )
@@ -0,0 +1,73 @@
+import logging
+from typing import List, Optional, Union
+
+from fastapi import APIRouter, HTTPException
+from starlette import status
+from starlette.responses import JSONResponse
+
+from app.schema import ShoeInventorySchema
+from app.services.inventory import shoe_inventory
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter(tags=["Inventory v1"])
+
+
+@router.get("/inventory", response_model=List[ShoeInventorySchema])
+async def get_inventory(
+    shoe_size: Optional[int] = None,
+) -> Union[JSONResponse, HTTPException]:
+    """**Retrieve the available shoes per size.**
+
+    Availability is answered from the in-memory inventory index without querying the database.
+    Only sizes with a row in the `shoe_inventory` table are tracked.
+
+    **Query Parameters**:
+    - **shoe_size (int)**: Only return the availability of this shoe size.
+
+    **Returns**:
+    - **JSONResponse**: One entry per tracked shoe size with its `total` and `available` pairs.
+
+    **Raises**:
+    - **HTTPException**: If the requested shoe size is not tracked (404).
+    """
+    inventory = shoe_inventory.availability(shoe_size)
+    if shoe_size is not None and not inventory:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Shoe size {shoe_size} is not tracked.",
+        )
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content=inventory)
+
+
+@router.post("/inventory/{shoe_size}/return", response_model=ShoeInventorySchema)
+async def return_shoes(shoe_size: int) -> Union[JSONResponse, HTTPException]:
+    """**Put a returned pair of shoes back in stock.**
+
+    **Args**:
+    - **shoe_size (int)**: Size of the returned pair.
+
+    **Returns**:
+    - **JSONResponse**: The availability of the shoe size after the return.
+
+    **Raises**:
+    - **HTTPException**: If the shoe size is not tracked (404) or no pair of it is rented out (409).
+    """
+    if not shoe_inventory.is_tracked(shoe_size):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Shoe size {shoe_size} is not tracked.",
+        )
+    if not shoe_inventory.release(shoe_size):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"No pair of shoe size {shoe_size} is rented out.",
+        )
+
+    logger.info("Returned a pair of shoe size %s.", shoe_size)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=shoe_inventory.availability(shoe_size)[0],
+    )
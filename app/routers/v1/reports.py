@@ -0,0 +1,55 @@
+import datetime
+import logging
+from typing import Literal, Optional, Union
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette import status
+from starlette.responses import JSONResponse
+
+from app.schema import RentalReportSchema
+from app.services.rental_reports import rental_report_service
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+router = APIRouter(tags=["Reports v1"])
+
+
+@router.get("/reports/rentals", response_model=RentalReportSchema)
+async def get_rental_report(
+    group_by: Literal["day", "shoe_size", "discount"] = "day",
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+) -> Union[JSONResponse, HTTPException]:
+    """**Summarise the customer rentals per day, shoe size or discount.**
+
+    The report is computed from per-day rollups that are kept in memory and only
+    read the rentals created since the previous report, so repeated reports do
+    not scan the whole `customer_rentals` table.
+
+    **Query Parameters**:
+    - **group_by (str)**: `day`, `shoe_size` or `discount` (default `day`).
+    - **from (date)**: Only include rentals on or after this date.
+    - **to (date)**: Only include rentals on or before this date.
+
+    **Returns**:
+    - **JSONResponse**: Rental count, revenue, fee and discount statistics per group, ordered by the group key,
+      and the same statistics over all included rentals in `totals`.
+
+    **Raises**:
+    - **HTTPException**: If the date range is invalid, or an error occurs while reading the rentals.
+    """
+    try:
+        logger.info("Request received for the rental report grouped by %s.", group_by)
+        report = await rental_report_service(group_by, date_from, date_to)
+        return JSONResponse(status_code=status.HTTP_200_OK, content=report)
+
+    except ValueError as ve:
+        logger.warning("Invalid rental report request: %s", ve)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        logger.error("Error while building the rental report: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred while building the rental report: {str(e)}",
+        )
@@ -1,7 +1,7 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class CustomerContactInfoSchema(BaseModel):
@@ -38,8 +38,67 @@ class CustomerRentalsResponseSchema(BaseModel):
     id: int
     created_at: datetime
     customer_id: int
-    rental_fee: str
+    rental_date: date
     shoe_size: int
     rental_fee: float
     discount: int
     total_fee: float
+    discount_source: Optional[str] = None
+
+
+class CustomerRentalBatchResultSchema(BaseModel):
+    index: int
+    success: bool
+    rental: Optional[CustomerRentalsResponseSchema] = None
+    error: Optional[str] = None
+
+
+class CustomerImportErrorSchema(BaseModel):
+    line: int
+    error: str
+
+
+class CustomerImportSummarySchema(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[CustomerImportErrorSchema]
+    errors_truncated: bool
+
+
+class RentalJobSchema(BaseModel):
+    id: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    rental: Optional[CustomerRentalsResponseSchema] = None
+    error: Optional[str] = None
+
+
+class ShoeInventorySchema(BaseModel):
+    shoe_size: int
+    total: int
+    available: int
+
+
+class RentalReportStatisticsSchema(BaseModel):
+    rentals: int
+    gross_revenue: float
+    revenue: float
+    average_total_fee: Optional[float] = None
+    min_total_fee: Optional[float] = None
+    max_total_fee: Optional[float] = None
+    average_discount: Optional[float] = None
+    discount_p50: Optional[float] = None
+    discount_p90: Optional[float] = None
+
+
+class RentalReportGroupSchema(RentalReportStatisticsSchema):
+    key: Union[date, int]
+
+
+class RentalReportSchema(BaseModel):
+    group_by: str
+    from_: Optional[date] = Field(None, alias="from")
+    to: Optional[date] = None
+    groups: List[RentalReportGroupSchema]
+    totals: RentalReportStatisticsSchema
@@ -0,0 +1,123 @@
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic_core import to_json
+from starlette.responses import Response
+from typing_extensions import TypedDict
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+@lru_cache(maxsize=None)
+def rows_adapter(model: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    """Return a TypeAdapter validating and encoding rows of `model` with only `fields`.
+
+    Rows are validated as a TypedDict built from the model's field annotations,
+    which avoids creating a model instance per row.
+    """
+    row_type = TypedDict(
+        f"{model.__name__}Row",
+        {name: model.model_fields[name].annotation for name in fields},
+    )
+    return TypeAdapter(List[row_type])
+
+
+def resolve_fields(
+    model: Type[BaseModel], fields: Optional[str], required: Sequence[str] = ("id",)
+) -> List[str]:
+    """Parse a comma-separated `fields` query parameter into the columns to fetch.
+
+    Args:
+        model (Type[BaseModel]): The response schema the fields are selected from.
+        fields (Optional[str]): The requested fields, every schema field when empty.
+        required (Sequence[str]): Fields that are always included, e.g. the pagination key.
+
+    Returns:
+        List[str]: The selected fields, in the order they were requested.
+
+    Raises:
+        ValueError: If a requested field is not part of the schema.
+    """
+    if not fields:
+        return list(model.model_fields)
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}.")
+    return list(dict.fromkeys([*required, *requested]))
+
+
+def encode_rows(
+    rows: Sequence[Mapping[str, Any]],
+    model: Type[BaseModel],
+    fields: Optional[Sequence[str]] = None,
+    validate: Optional[bool] = None,
+) -> bytes:
+    """Encode rows as a JSON array, keeping only the selected fields.
+
+    With validation the rows are checked and coerced against the response
+    schema by pydantic-core and encoded in the same call. Without it they are
+    encoded as-is with orjson when it is installed, or pydantic-core otherwise.
+
+    Args:
+        rows (Sequence[Mapping[str, Any]]): The rows returned by the database.
+        model (Type[BaseModel]): The response schema of a row.
+        fields (Optional[Sequence[str]]): The fields to keep, every schema field by default.
+        validate (Optional[bool]): Whether to validate rows, defaults to `settings.RESPONSE_VALIDATION`.
+
+    Returns:
+        bytes: The encoded JSON array.
+
+    Raises:
+        RuntimeError: If validation is enabled and a row does not match the schema.
+    """
+    fields = tuple(fields or model.model_fields)
+    if validate is None:
+        validate = settings.RESPONSE_VALIDATION
+
+    if validate:
+        adapter = rows_adapter(model, fields)
+        try:
+            return adapter.dump_json(adapter.validate_python(rows))
+        except ValidationError as ve:
+            # Not a ValueError to callers, the rows come from the database rather than the request
+            raise RuntimeError(
+                f"Rows do not match {model.__name__}: {ve.error_count()} errors."
+            ) from ve
+
+    # Rows fetched with exactly the selected columns are encoded as they are
+    if rows and set(rows[0]) != set(fields):
+        rows = [{field: row.get(field) for field in fields} for row in rows]
+    if orjson is not None:
+        return orjson.dumps(rows)
+    return to_json(rows)
+
+
+class RowsResponse(Response):
+    """JSON response for a list of database rows, see `encode_rows`."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        rows: Sequence[Mapping[str, Any]],
+        model: Type[BaseModel],
+        fields: Optional[Sequence[str]] = None,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        validate: Optional[bool] = None,
+    ):
+        self.model = model
+        self.fields = fields
+        self.validate = validate
+        super().__init__(content=rows, status_code=status_code, headers=headers)
+
+    def render(self, content: Sequence[Mapping[str, Any]]) -> bytes:
+        return encode_rows(content, self.model, self.fields, self.validate)
@@ -0,0 +1,246 @@
+import codecs
+import csv
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.queries import async_bulk_create_query
+from app.schema import CustomerSchema
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Columns of a CSV import, medical conditions are separated by semicolons
+CSV_IMPORT_COLUMNS = [
+    "name",
+    "age",
+    "is_disabled",
+    "medical_conditions",
+    "contact_number",
+    "email_address",
+    "address",
+]
+
+# Rejected rows reported in an import summary, further rejections are only counted
+MAX_REPORTED_IMPORT_ERRORS = 1000
+
+
+async def iter_text_lines(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[Tuple[int, str]]:
+    """Split a stream of UTF-8 encoded bytes into numbered text lines.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw byte chunks, e.g. a request body stream.
+
+    Yields:
+        Tuple[int, str]: The 1-based line number and the line without its line ending.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_number = 0
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield line_number + 1, pending.rstrip("\r")
+
+
+async def iter_ndjson_records(
+    lines: AsyncIterator[Tuple[int, str]],
+) -> AsyncIterator[Tuple[int, Any]]:
+    """Parse NDJSON lines into records, skipping blank lines.
+
+    Yields:
+        Tuple[int, Any]: The line number and the decoded JSON value, or the
+        ``ValueError`` raised while decoding it.
+    """
+    async for line_number, line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as ve:
+            yield line_number, ve
+
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    medical_conditions = [
+        condition.strip()
+        for condition in (row.get("medical_conditions") or "").split(";")
+        if condition.strip()
+    ]
+    return {
+        "name": row.get("name"),
+        "age": row.get("age"),
+        "is_disabled": row.get("is_disabled"),
+        "medical_conditions": medical_conditions or None,
+        "contact_info": [
+            {
+                "contact_number": row.get("contact_number"),
+                "email_address": row.get("email_address"),
+                "address": row.get("address"),
+            }
+        ],
+    }
+
+
+async def iter_csv_records(
+    lines: AsyncIterator[Tuple[int, str]],
+) -> AsyncIterator[Tuple[int, Any]]:
+    """Parse CSV lines into customer records.
+
+    The first line must be a header naming the `CSV_IMPORT_COLUMNS`. Quoted
+    fields may span several lines; a record is reported with the line number
+    it starts on.
+
+    Yields:
+        Tuple[int, Any]: The line number and the customer record, or the
+        ``ValueError`` raised while parsing it.
+    """
+    header: Optional[List[str]] = None
+    record_lines: List[str] = []
+    record_start = 0
+
+    async for line_number, line in lines:
+        if not record_lines:
+            if not line.strip():
+                continue
+            record_start = line_number
+        record_lines.append(line)
+
+        # An odd number of quotes means a quoted field continues on the next line
+        record = "\n".join(record_lines)
+        if record.count('"') % 2:
+            continue
+        record_lines = []
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [column.strip() for column in values]
+            missing_columns = set(CSV_IMPORT_COLUMNS) - set(header)
+            if missing_columns:
+                raise ValueError(
+                    f"CSV header is missing columns: {', '.join(sorted(missing_columns))}."
+                )
+            continue
+
+        if len(values) != len(header):
+            yield record_start, ValueError(
+                f"Expected {len(header)} columns but found {len(values)}."
+            )
+            continue
+
+        yield record_start, _csv_record(dict(zip(header, values)))
+
+    if record_lines:
+        yield record_start, ValueError("Unterminated quoted field.")
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+async def import_customers_service(
+    chunks: AsyncIterator[bytes],
+    import_format: str,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Validate and insert customers streamed from a CSV or NDJSON file.
+
+    Rows are validated one at a time against `CustomerSchema` and inserted in
+    chunks through `async_bulk_create_query`, so neither the file nor the full
+    set of customers is ever held in memory.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw byte chunks of the file.
+        import_format (str): Either ``"csv"`` or ``"ndjson"``.
+        chunk_size (Optional[int]): Customers per insert, defaults to `settings.CUSTOMER_IMPORT_CHUNK_SIZE`.
+
+    Returns:
+        Dict[str, Any]: A summary with the ``accepted`` and ``rejected`` row counts and the
+        line number and reason of each rejected row in ``errors``.
+
+    Raises:
+        ValueError: If the format is unsupported or the CSV header is invalid.
+    """
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: '{import_format}'.")
+
+    chunk_size = chunk_size or settings.CUSTOMER_IMPORT_CHUNK_SIZE
+    summary: Dict[str, Any] = {
+        "accepted": 0,
+        "rejected": 0,
+        "errors": [],
+        "errors_truncated": False,
+    }
+
+    def reject(line_number: int, message: str) -> None:
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_IMPORT_ERRORS:
+            summary["errors"].append({"line": line_number, "error": message})
+        else:
+            summary["errors_truncated"] = True
+
+    pending_lines: List[int] = []
+    pending_rows: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        if not pending_rows:
+            return
+        try:
+            await async_bulk_create_query(table="customers", rows=pending_rows)
+            summary["accepted"] += len(pending_rows)
+        except Exception as e:
+            logger.error(
+                "Failed to insert a chunk of %s customers: %s", len(pending_rows), e
+            )
+            for line_number in pending_lines:
+                reject(line_number, f"Insert failed: {e}")
+        pending_lines.clear()
+        pending_rows.clear()
+
+    lines = iter_text_lines(chunks)
+    if import_format == "csv":
+        records = iter_csv_records(lines)
+    else:
+        records = iter_ndjson_records(lines)
+
+    async for line_number, record in records:
+        if isinstance(record, Exception):
+            reject(line_number, str(record))
+            continue
+
+        try:
+            customer = CustomerSchema.model_validate(record)
+        except ValidationError as ve:
+            reject(line_number, _validation_message(ve))
+            continue
+
+        pending_lines.append(line_number)
+        pending_rows.append(customer.model_dump())
+        if len(pending_rows) >= chunk_size:
+            await flush()
+
+    await flush()
+
+    logger.info(
+        "Customer import finished: %s accepted, %s rejected.",
+        summary["accepted"],
+        summary["rejected"],
+    )
+    return summary
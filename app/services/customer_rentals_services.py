@@ -1,23 +1,67 @@
+import asyncio
 import datetime
 import logging
-from typing import Any, Dict, List
-
-from app.ai.gpt.services import query_gpt_model
-from app.queries import create_query, retrieve_query
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.ai.gpt.services import batched_query_gpt_model, llm_circuit_breaker
+from app.cache import MISSING
+from app.config import settings
+from app.metrics import DISCOUNT_FALLBACKS
+from app.queries import (
+    async_bulk_create_query,
+    async_create_query,
+    async_retrieve_customers,
+    async_update_query,
+)
 from app.schema import CustomerRentalsSchema
+from app.services.discount_cache import (
+    current_discount_version,
+    discount_cache,
+    discount_cache_key,
+    discount_flights,
+    discount_prompt_key,
+)
+from app.services.discount_rules import (
+    DISCOUNT_MODE_LLM,
+    DISCOUNT_MODE_RULES,
+    DISCOUNT_MODES,
+    get_discount_rules,
+)
+from app.services.inventory import ShoeSizeUnavailableError, shoe_inventory
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# How the discount of a rental was determined, stored in its `discount_source` column
+DISCOUNT_SOURCE_STORED = "stored"
+DISCOUNT_SOURCE_CALCULATED = "calculated"
+DISCOUNT_SOURCE_RULES_FALLBACK = "rules_fallback"
+DISCOUNT_SOURCE_LAST_KNOWN = "last_known"
+
+DEGRADED_STRATEGY_RULES = "rules"
+DEGRADED_STRATEGY_LAST_KNOWN = "last_known"
+
 
 class DiscountCalculator:
-    def __init__(self, prompt: str):
+    def __init__(
+        self,
+        prompt: str,
+        age: Optional[int] = None,
+        is_disabled: bool = False,
+        medical_conditions: Optional[List[str]] = None,
+    ):
         """Initialize the DiscountCalculator with the given prompt.
 
         Args:
             prompt (str): The user prompt containing customer information for discount calculation.
+            age (Optional[int]): Age of the customer, required for rule evaluation.
+            is_disabled (bool): Whether the customer is disabled.
+            medical_conditions (Optional[List[str]]): The customer's medical conditions.
         """
         self.prompt = prompt
+        self.age = age
+        self.is_disabled = is_disabled
+        self.medical_conditions = medical_conditions or []
 
     @classmethod
     def _system_message_instructions(cls) -> str:
@@ -58,24 +102,29 @@ class DiscountCalculator:
         Return only the numerical value, without any additional text or explanation.
         """
 
-    def calculate_discount_using_llm(self) -> int:
+    async def calculate_discount_using_llm(self) -> int:
         """Query the LLM to determine the discount percentage based on customer information.
 
         This method sends a request to the GPT model with customer details and retrieves
-        the calculated discount percentage.
+        the calculated discount percentage. The request goes through the LLM circuit
+        breaker, which rejects it immediately while the OpenAI API is failing or too
+        many requests are pending.
 
         Returns:
             int: The calculated discount percentage as an integer.
 
         Raises:
             ValueError: If the response from the LLM is not a valid percentage.
+            CircuitOpenError: If the circuit breaker rejected the request.
             Exception: For general API-related issues or connectivity problems.
         """
         try:
             # Query the GPT model with the system instructions and user prompt
-            calculated_discount_from_gpt = query_gpt_model(
-                system_message=self._system_message_instructions(),
-                user_prompt=self.prompt,
+            calculated_discount_from_gpt = await llm_circuit_breaker.call(
+                lambda: batched_query_gpt_model(
+                    system_message=self._system_message_instructions(),
+                    user_prompt=self.prompt,
+                )
             )
 
             # Check if the output is a valid percentage
@@ -87,12 +136,271 @@ class DiscountCalculator:
             return int(calculated_discount_from_gpt)
 
         except ValueError as ve:
-            print(f"ValueError encountered: {ve}")
+            logger.error("ValueError encountered: %s", ve)
             raise
         except Exception as e:
-            print(f"An unexpected error occurred while querying the LLM: {e}")
+            logger.error("An unexpected error occurred while querying the LLM: %s", e)
             raise
 
+    async def calculate_discount(self, mode: Optional[str] = None) -> int:
+        """Determine the discount percentage using the configured discount mode.
+
+        In ``rules`` mode only the compiled rule table is consulted and unknown
+        medical conditions grant no discount. In ``rules_then_llm`` mode the LLM
+        is queried only when the customer has conditions the rule table does not
+        recognise. In ``llm`` mode every calculation goes to the LLM.
+
+        Results are memoized in the discount cache, keyed on the customer's age
+        band, disability status and normalized medical conditions, and concurrent
+        calculations for the same key share a single in-flight calculation.
+
+        Args:
+            mode (Optional[str]): The discount mode, defaults to ``settings.DISCOUNT_MODE``.
+
+        Returns:
+            int: The calculated discount percentage as an integer.
+
+        Raises:
+            ValueError: If the mode is unknown or the LLM returns an invalid percentage.
+        """
+        mode = mode or settings.DISCOUNT_MODE
+        if mode not in DISCOUNT_MODES:
+            raise ValueError(f"Unknown discount mode: '{mode}'.")
+
+        if self.age is None:
+            return await discount_flights.run(
+                discount_prompt_key(self._system_message_instructions(), self.prompt),
+                self.calculate_discount_using_llm,
+            )
+
+        cache_key = discount_cache_key(
+            mode=mode,
+            age=self.age,
+            is_disabled=self.is_disabled,
+            medical_conditions=self.medical_conditions,
+        )
+        discount = discount_cache.get(cache_key)
+        if discount is MISSING:
+            discount = await discount_flights.run(
+                cache_key, lambda: self._calculate_discount_uncached(mode)
+            )
+            discount_cache.set(cache_key, discount)
+        return discount
+
+    async def _calculate_discount_uncached(self, mode: str) -> int:
+        if mode == DISCOUNT_MODE_LLM:
+            return await self.calculate_discount_using_llm()
+
+        rules_discount, unknown_conditions = get_discount_rules().evaluate(
+            age=self.age,
+            is_disabled=self.is_disabled,
+            medical_conditions=self.medical_conditions,
+        )
+        if mode == DISCOUNT_MODE_RULES or not unknown_conditions:
+            return rules_discount
+
+        logger.info(
+            "Unrecognised medical conditions %s, querying the LLM.",
+            list(unknown_conditions),
+        )
+        return max(rules_discount, await self.calculate_discount_using_llm())
+
+
+# Customer columns needed to calculate a rental's discount
+CUSTOMER_COLUMNS = [
+    "id",
+    "name",
+    "age",
+    "is_disabled",
+    "medical_conditions",
+    "discount",
+    "discount_version",
+]
+
+# Keeps fire-and-forget discount updates referenced until they finish
+_discount_update_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def build_discount_calculator(customer_info: Dict[str, Any]) -> DiscountCalculator:
+    """Build a DiscountCalculator from a customer record.
+
+    Args:
+        customer_info (Dict[str, Any]): The customer record retrieved from the database.
+
+    Returns:
+        DiscountCalculator: A calculator for the customer's discount.
+    """
+    # Extract customer details
+    customer_age: int = customer_info.get("age")
+    customer_is_disabled: bool = customer_info.get("is_disabled")
+    customer_medical_conditions: List[str] = customer_info.get("medical_conditions", [])
+
+    # Create a customer information message
+    medical_conditions_info = (
+        ", ".join(customer_medical_conditions)
+        if customer_medical_conditions
+        else "None"
+    )
+    customer_details_message: str = (
+        f"The customer is {customer_age} years old. "
+        f"{'Disabled' if customer_is_disabled else 'Not Disabled'}. "
+        f"Medical conditions: {medical_conditions_info}."
+    )
+
+    return DiscountCalculator(
+        prompt=customer_details_message,
+        age=customer_age,
+        is_disabled=customer_is_disabled,
+        medical_conditions=customer_medical_conditions,
+    )
+
+
+async def store_customer_discount(
+    customer_id: int, discount: int, version: str
+) -> None:
+    """Persist a precomputed discount on the customer record.
+
+    Failures are logged and swallowed, as the discount is recomputed on the next rental.
+
+    Args:
+        customer_id (int): ID of the customer.
+        discount (int): The calculated discount percentage.
+        version (str): The discount version the discount was calculated with.
+    """
+    try:
+        await async_update_query(
+            table="customers",
+            data={"discount": discount, "discount_version": version},
+            filters={"id": customer_id},
+        )
+        logger.info(
+            "Stored discount %s for customer with ID: %s", discount, customer_id
+        )
+    except Exception as e:
+        logger.error("Failed to store discount for customer %s: %s", customer_id, e)
+
+
+async def precompute_customer_discount_service(customer_info: Dict[str, Any]) -> None:
+    """Calculate a new customer's discount and store it on the customer record.
+
+    Meant to run as a background task after the customer is created, so the
+    discount is off the rental hot path. Failures are logged and swallowed.
+
+    Args:
+        customer_info (Dict[str, Any]): The created customer record.
+    """
+    try:
+        version = current_discount_version()
+        discount = await build_discount_calculator(customer_info).calculate_discount()
+        await store_customer_discount(customer_info["id"], discount, version)
+    except Exception as e:
+        logger.error(
+            "Failed to precompute discount for customer %s: %s",
+            customer_info.get("id"),
+            e,
+        )
+
+
+def degraded_customer_discount(customer_info: Dict[str, Any]) -> Tuple[int, str]:
+    """Return the customer's discount without the LLM, using the degraded strategy.
+
+    With the ``last_known`` strategy the customer's stored discount is used even
+    if it was calculated with an older discount version. Otherwise, or when no
+    discount is stored, the rule table is evaluated locally and unknown medical
+    conditions grant no discount.
+
+    Args:
+        customer_info (Dict[str, Any]): The customer record, including `discount`.
+
+    Returns:
+        Tuple[int, str]: The discount percentage and its discount source.
+    """
+    stored_discount = customer_info.get("discount")
+    if (
+        settings.DISCOUNT_DEGRADED_STRATEGY == DEGRADED_STRATEGY_LAST_KNOWN
+        and stored_discount is not None
+    ):
+        return stored_discount, DISCOUNT_SOURCE_LAST_KNOWN
+
+    age = customer_info.get("age")
+    discount, _ = get_discount_rules().evaluate(
+        age=age if age is not None else -1,
+        is_disabled=bool(customer_info.get("is_disabled")),
+        medical_conditions=customer_info.get("medical_conditions"),
+    )
+    return discount, DISCOUNT_SOURCE_RULES_FALLBACK
+
+
+async def resolve_customer_discount(customer_info: Dict[str, Any]) -> Tuple[int, str]:
+    """Return the customer's discount, preferring the precomputed value.
+
+    The stored discount is used when its version matches the current discount
+    version. Otherwise the discount is recalculated and the refreshed value is
+    stored in the background. When the calculation fails, e.g. because the LLM
+    circuit breaker is open, the degraded discount is returned instead and
+    neither cached nor stored.
+
+    Args:
+        customer_info (Dict[str, Any]): The customer record, including `discount` and `discount_version`.
+
+    Returns:
+        Tuple[int, str]: The customer's discount percentage and its discount source.
+    """
+    version = current_discount_version()
+    stored_discount = customer_info.get("discount")
+    if stored_discount is not None and customer_info.get("discount_version") == version:
+        return stored_discount, DISCOUNT_SOURCE_STORED
+
+    try:
+        discount = await build_discount_calculator(customer_info).calculate_discount()
+    except Exception as e:
+        discount, source = degraded_customer_discount(customer_info)
+        DISCOUNT_FALLBACKS.inc(source=source)
+        logger.warning(
+            "Discount calculation failed for customer %s, using the %s discount %s: %s",
+            customer_info.get("id"),
+            source,
+            discount,
+            e,
+        )
+        return discount, source
+
+    task = asyncio.ensure_future(
+        store_customer_discount(customer_info["id"], discount, version)
+    )
+    _discount_update_tasks.add(task)
+    task.add_done_callback(_discount_update_tasks.discard)
+    return discount, DISCOUNT_SOURCE_CALCULATED
+
+
+def build_customer_rental_data(
+    payload: CustomerRentalsSchema,
+    total_discount: int,
+    discount_source: str = DISCOUNT_SOURCE_CALCULATED,
+) -> Dict[str, Any]:
+    """Prepare a customer rental row for insertion.
+
+    Args:
+        payload (CustomerRentalsSchema): The payload containing customer rental details.
+        total_discount (int): The discount calculated for the customer.
+        discount_source (str): How the discount was determined, e.g. ``"rules_fallback"``.
+
+    Returns:
+        Dict[str, Any]: The customer rental data to insert.
+    """
+    # Calculate the total fee after applying the discount
+    total_fee: float = payload.rental_fee - total_discount
+
+    return {
+        "customer_id": payload.customer_id,
+        "rental_date": datetime.date.today().strftime("%Y-%m-%d"),
+        "shoe_size": payload.shoe_size,
+        "rental_fee": payload.rental_fee,
+        "discount": total_discount,
+        "total_fee": round(total_fee, 2),
+        "discount_source": discount_source,
+    }
+
 
 async def create_customer_rental_service(
     payload: CustomerRentalsSchema,
@@ -107,76 +415,141 @@ async def create_customer_rental_service(
 
     Raises:
         ValueError: If the customer cannot be found or if any data is invalid.
+        ShoeSizeUnavailableError: If the requested shoe size is out of stock.
     """
     try:
         # Retrieve the customer information from the database
-        customer_records = retrieve_query(
-            table="customers",
-            columns=[
-                "id",
-                "created_at",
-                "name",
-                "age",
-                "contact_info",
-                "is_disabled",
-                "medical_conditions",
-            ],
-            filters={"id": payload.customer_id},
+        customer_records = await async_retrieve_customers(
+            customer_ids=[payload.customer_id], columns=CUSTOMER_COLUMNS
         )
 
         # Check if the customer was found
-        if not customer_records:
+        if payload.customer_id not in customer_records:
             raise Exception("Customer not found")
 
-        customer_info = customer_records[0]
-        logging.info(f"Customer found: {customer_info.get('name')}")
+        customer_info = customer_records[payload.customer_id]
+        logger.info("Customer found with ID: %s", payload.customer_id)
 
-        # Extract customer details
-        customer_age: int = customer_info.get("age")
-        customer_is_disabled: bool = customer_info.get("is_disabled")
-        customer_medical_conditions: List[str] = customer_info.get(
-            "medical_conditions", []
-        )
+        # Take a pair of the requested size out of stock, checked in memory
+        reserved = shoe_inventory.reserve(payload.shoe_size)
+
+        try:
+            # Use the precomputed discount, or calculate it from customer information
+            total_discount, discount_source = await resolve_customer_discount(
+                customer_info
+            )
+
+            # Prepare customer rental data for insertion
+            customer_rental_data = build_customer_rental_data(
+                payload, total_discount, discount_source
+            )
+
+            # Insert the rental data into the database
+            created_rental_record = await async_create_query(
+                table="customer_rentals", data=customer_rental_data
+            )
+        except BaseException:
+            # Put the pair back in stock if the rental was not created
+            if reserved:
+                shoe_inventory.release(payload.shoe_size)
+            raise
 
-        # Create a customer information message
-        medical_conditions_info = (
-            ", ".join(customer_medical_conditions)
-            if customer_medical_conditions
-            else "None"
-        )
-        customer_details_message: str = (
-            f"The customer is {customer_age} years old. "
-            f"{'Disabled' if customer_is_disabled else 'Not Disabled'}. "
-            f"Medical conditions: {medical_conditions_info}."
-        )
-        logging.info(f"Customer info: {customer_details_message}")
-
-        # Calculate total discount based on customer information
-        discount_calculator = DiscountCalculator(prompt=customer_details_message)
-        total_discount = discount_calculator.calculate_discount_using_llm()
-
-        # Calculate the total fee after applying the discount
-        total_fee: float = payload.rental_fee - total_discount
-
-        # Prepare customer rental data for insertion
-        customer_rental_data: Dict[str, Any] = {
-            "customer_id": payload.customer_id,
-            "rental_date": datetime.date.today().strftime("%Y-%m-%d"),
-            "shoe_size": payload.shoe_size,
-            "rental_fee": payload.rental_fee,
-            "discount": total_discount,
-            "total_fee": round(total_fee, 2),
-        }
-
-        # Insert the rental data into the database
-        created_rental_record = create_query(
-            table="customer_rentals", data=customer_rental_data
-        )
         return created_rental_record
 
     except ValueError as ve:
-        logging.error(f"ValueError: {ve}")
+        logger.error("ValueError: %s", ve)
         raise
     except Exception as e:
-        logging.error(f"An error occurred while creating customer rental: {e}")
+        logger.error("An error occurred while creating customer rental: %s", e)
         raise
+
+
+async def create_customer_rentals_batch_service(
+    payloads: List[CustomerRentalsSchema],
+) -> List[Dict[str, Any]]:
+    """Creates many customer rental entries with a fixed number of database round trips.
+
+    All referenced customers are fetched with a single ``in`` query, the discount of each
+    distinct customer is calculated concurrently and all rentals are inserted with a single
+    multi-row insert.
+
+    Args:
+        payloads (List[CustomerRentalsSchema]): The customer rentals to create.
+
+    Returns:
+        List[Dict[str, Any]]: One result per payload, in order, with the keys ``index``,
+        ``success``, ``rental`` (the created row) and ``error``.
+
+    Raises:
+        Exception: If the customer lookup fails.
+    """
+    results: List[Dict[str, Any]] = [
+        {"index": index, "success": False, "rental": None, "error": None}
+        for index in range(len(payloads))
+    ]
+    if not payloads:
+        return results
+
+    # Retrieve every referenced customer at once, cached customers from memory
+    customer_ids = sorted({payload.customer_id for payload in payloads})
+    customers = await async_retrieve_customers(
+        customer_ids=customer_ids, columns=CUSTOMER_COLUMNS
+    )
+
+    # Calculate the discount of each distinct customer concurrently
+    found_ids = [
+        customer_id for customer_id in customer_ids if customer_id in customers
+    ]
+    discounts = await asyncio.gather(
+        *(
+            resolve_customer_discount(customers[customer_id])
+            for customer_id in found_ids
+        ),
+        return_exceptions=True,
+    )
+    customer_discounts = dict(zip(found_ids, discounts))
+
+    # Prepare the rentals that can be inserted, reserving their shoes
+    pending_indexes: List[int] = []
+    reserved_sizes: List[int] = []
+    rental_rows: List[Dict[str, Any]] = []
+    for index, payload in enumerate(payloads):
+        resolved = customer_discounts.get(payload.customer_id)
+        if resolved is None:
+            results[index]["error"] = "Customer not found"
+            continue
+        if isinstance(resolved, Exception):
+            results[index]["error"] = f"Discount calculation failed: {resolved}"
+            continue
+        discount, discount_source = resolved
+        try:
+            if shoe_inventory.reserve(payload.shoe_size):
+                reserved_sizes.append(payload.shoe_size)
+        except ShoeSizeUnavailableError as e:
+            results[index]["error"] = str(e)
+            continue
+        pending_indexes.append(index)
+        rental_rows.append(
+            build_customer_rental_data(payload, discount, discount_source)
+        )
+
+    if rental_rows:
+        try:
+            created_rows = await async_bulk_create_query(
+                table="customer_rentals", rows=rental_rows
+            )
+            for index, created_row in zip(pending_indexes, created_rows):
+                results[index].update(success=True, rental=created_row)
+        except Exception as e:
+            logger.error("An error occurred while inserting customer rentals: %s", e)
+            for index in pending_indexes:
+                results[index]["error"] = f"Insert failed: {e}"
+            for shoe_size in reserved_sizes:
+                shoe_inventory.release(shoe_size)
+
+    logger.info(
+        "Created %s of %s customer rentals in batch.",
+        sum(result["success"] for result in results),
+        len(payloads),
+    )
+    return results
@@ -0,0 +1,96 @@
+import logging
+from typing import Hashable, Iterable, Optional, Tuple
+
+from app.cache import SingleFlight, TTLCache
+from app.config import settings
+from app.services.discount_rules import get_discount_rules, normalize_conditions
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+discount_cache = TTLCache(
+    max_size=settings.DISCOUNT_CACHE_MAX_SIZE,
+    ttl_seconds=settings.DISCOUNT_CACHE_TTL_SECONDS,
+)
+
+# Coalesces concurrent calculations of the same discount cache key or LLM prompt
+discount_flights = SingleFlight()
+
+# The rule set version and GPT model the cached discounts were calculated with
+_cache_generation: Optional[Tuple[str, str]] = None
+
+
+def discount_cache_key(
+    mode: str,
+    age: int,
+    is_disabled: bool,
+    medical_conditions: Optional[Iterable[str]],
+) -> Hashable:
+    """Build the canonical discount cache key for a customer profile.
+
+    The age is collapsed to its age band and the medical conditions are
+    lower-cased, deduplicated and sorted, so every customer sharing a profile
+    shares a cache entry. The cache is cleared whenever the rule set version or
+    the GPT model differs from the one the cached entries were calculated with.
+
+    Args:
+        mode (str): The discount mode the discount is calculated with.
+        age (int): Age of the customer.
+        is_disabled (bool): Whether the customer is disabled.
+        medical_conditions (Optional[Iterable[str]]): The customer's medical conditions.
+
+    Returns:
+        Hashable: The cache key.
+    """
+    global _cache_generation
+
+    rules = get_discount_rules()
+    generation = (rules.version, settings.GPT_MODEL)
+    if generation != _cache_generation:
+        if _cache_generation is not None:
+            logger.info(
+                "Discount rules or GPT model changed to %s, clearing the discount cache.",
+                generation,
+            )
+        discount_cache.clear()
+        _cache_generation = generation
+
+    return (
+        mode,
+        rules.age_band(age),
+        bool(is_disabled),
+        normalize_conditions(medical_conditions),
+    )
+
+
+def discount_prompt_key(system_message: str, user_prompt: str) -> Hashable:
+    """Build the single-flight key of an LLM discount prompt.
+
+    Args:
+        system_message (str): The system message sent to the LLM.
+        user_prompt (str): The customer details prompt.
+
+    Returns:
+        Hashable: The prompts with whitespace collapsed and the user prompt lower-cased.
+    """
+    return (
+        settings.GPT_MODEL,
+        " ".join(system_message.split()),
+        " ".join(user_prompt.lower().split()),
+    )
+
+
+def current_discount_version(mode: Optional[str] = None) -> str:
+    """Return the version identifying how discounts are currently calculated.
+
+    A stored discount is current when it was calculated with the same discount
+    mode, rule set version and GPT model.
+
+    Args:
+        mode (Optional[str]): The discount mode, defaults to ``settings.DISCOUNT_MODE``.
+
+    Returns:
+        str: The discount version string.
+    """
+    mode = mode or settings.DISCOUNT_MODE
+    return f"{mode}:{get_discount_rules().version}:{settings.GPT_MODEL}"
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Ages above this value share the lookup slot of the oldest age
+MAX_LOOKUP_AGE = 130
+
+# Condition values that mean "no medical condition"
+EMPTY_CONDITIONS = frozenset({"", "none", "n/a", "na"})
+
+DISCOUNT_MODE_RULES = "rules"
+DISCOUNT_MODE_RULES_THEN_LLM = "rules_then_llm"
+DISCOUNT_MODE_LLM = "llm"
+DISCOUNT_MODES = (
+    DISCOUNT_MODE_RULES,
+    DISCOUNT_MODE_RULES_THEN_LLM,
+    DISCOUNT_MODE_LLM,
+)
+
+
+class AgeBandRule(BaseModel):
+    min_age: int
+    max_age: Optional[int] = None
+    discount: int
+
+
+class DiscountRuleTable(BaseModel):
+    age_bands: List[AgeBandRule]
+    disability_discount: int
+    medical_conditions: Dict[str, int]
+
+
+DEFAULT_RULE_TABLE = DiscountRuleTable(
+    age_bands=[
+        AgeBandRule(min_age=0, max_age=12, discount=20),
+        AgeBandRule(min_age=13, max_age=18, discount=10),
+        AgeBandRule(min_age=65, max_age=None, discount=15),
+    ],
+    disability_discount=25,
+    medical_conditions={
+        "diabetes": 10,
+        "hypertension": 10,
+        "chronic condition": 10,
+    },
+)
+
+
+def normalize_condition(condition: str) -> str:
+    """Normalize a medical condition name for rule lookups.
+
+    Args:
+        condition (str): The raw medical condition as stored on the customer.
+
+    Returns:
+        str: The condition lower-cased with surrounding whitespace removed.
+    """
+    return " ".join(condition.strip().lower().split())
+
+
+def normalize_conditions(conditions: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Normalize, deduplicate and sort a collection of medical conditions.
+
+    Args:
+        conditions (Optional[Iterable[str]]): The raw medical conditions.
+
+    Returns:
+        Tuple[str, ...]: The sorted unique conditions, without "none" placeholders.
+    """
+    if not conditions:
+        return ()
+
+    normalized = {normalize_condition(condition) for condition in conditions}
+    return tuple(sorted(normalized - EMPTY_CONDITIONS))
+
+
+class CompiledDiscountRules:
+    def __init__(self, table: DiscountRuleTable):
+        """Compile a rule table into constant-time lookup structures.
+
+        Args:
+            table (DiscountRuleTable): The discount rules to compile.
+        """
+        self.table = table
+        self.disability_discount = table.disability_discount
+        self.condition_discounts: Dict[str, int] = {
+            normalize_condition(name): discount
+            for name, discount in table.medical_conditions.items()
+        }
+
+        # Precompute the best age discount and the set of matching bands for every age
+        age_discounts = [0] * (MAX_LOOKUP_AGE + 1)
+        age_band_sets: List[Tuple[int, ...]] = [()] * (MAX_LOOKUP_AGE + 1)
+        for index, band in enumerate(table.age_bands):
+            upper = MAX_LOOKUP_AGE if band.max_age is None else band.max_age
+            for age in range(max(band.min_age, 0), min(upper, MAX_LOOKUP_AGE) + 1):
+                age_discounts[age] = max(age_discounts[age], band.discount)
+                age_band_sets[age] += (index,)
+        self.age_discounts: Tuple[int, ...] = tuple(age_discounts)
+
+        # Ages matching the same set of bands share one band id
+        band_ids: Dict[Tuple[int, ...], int] = {}
+        self.age_band_ids: Tuple[int, ...] = tuple(
+            band_ids.setdefault(band_set, len(band_ids)) for band_set in age_band_sets
+        )
+
+        self.version = hashlib.sha256(
+            json.dumps(table.model_dump(), sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+
+    def age_discount(self, age: int) -> int:
+        """Return the age band discount for the given age."""
+        if age < 0:
+            return 0
+        return self.age_discounts[min(age, MAX_LOOKUP_AGE)]
+
+    def age_band(self, age: int) -> int:
+        """Return an id shared by every age that matches the same set of age bands."""
+        if age < 0:
+            return -1
+        return self.age_band_ids[min(age, MAX_LOOKUP_AGE)]
+
+    def evaluate(
+        self,
+        age: int,
+        is_disabled: bool,
+        medical_conditions: Optional[Iterable[str]] = None,
+    ) -> Tuple[int, Tuple[str, ...]]:
+        """Evaluate the highest applicable discount for a customer.
+
+        Args:
+            age (int): Age of the customer.
+            is_disabled (bool): Whether the customer is disabled.
+            medical_conditions (Optional[Iterable[str]]): The customer's medical conditions.
+
+        Returns:
+            Tuple[int, Tuple[str, ...]]: The highest discount the rule table grants and the
+            normalized conditions the rule table does not recognise.
+        """
+        discount = self.age_discount(age)
+        if is_disabled:
+            discount = max(discount, self.disability_discount)
+
+        unknown_conditions: List[str] = []
+        for condition in normalize_conditions(medical_conditions):
+            condition_discount = self.condition_discounts.get(condition)
+            if condition_discount is None:
+                unknown_conditions.append(condition)
+            else:
+                discount = max(discount, condition_discount)
+
+        return discount, tuple(unknown_conditions)
+
+
+def load_rule_table(path: str = "") -> DiscountRuleTable:
+    """Load the discount rule table from a JSON file.
+
+    Args:
+        path (str): Path to a JSON rule table. The built-in rules are used when empty.
+
+    Returns:
+        DiscountRuleTable: The validated rule table.
+
+    Raises:
+        ValueError: If the file cannot be read or does not match the rule table schema.
+    """
+    if not path:
+        return DEFAULT_RULE_TABLE
+
+    try:
+        with open(path, encoding="utf-8") as rules_file:
+            table = DiscountRuleTable.model_validate(json.load(rules_file))
+    except Exception as e:
+        raise ValueError(f"Failed to load discount rules from '{path}': {e}")
+
+    logger.info("Loaded discount rules from '%s'.", path)
+    return table
+
+
+@lru_cache(maxsize=1)
+def get_discount_rules() -> CompiledDiscountRules:
+    """Return the compiled discount rules configured in settings."""
+    return CompiledDiscountRules(load_rule_table(settings.DISCOUNT_RULES_PATH))
+
+
+def reload_discount_rules() -> CompiledDiscountRules:
+    """Recompile the discount rules from settings, e.g. after the rule file changed."""
+    get_discount_rules.cache_clear()
+    return get_discount_rules()
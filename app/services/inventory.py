@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.queries import async_retrieve_query, async_update_query
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+INVENTORY_COLUMNS = ["id", "shoe_size", "total", "available"]
+
+
+class ShoeSizeUnavailableError(Exception):
+    """Raised when no pair of the requested shoe size is available."""
+
+
+class ShoeInventory:
+    def __init__(self, flush_interval_seconds: float):
+        """Initialize an in-memory index of the available shoes per size.
+
+        Counters are hydrated from the `shoe_inventory` table on startup and
+        reserved and returned in memory, so availability is checked without a
+        database query. Changed counters are written back in batches every
+        `flush_interval_seconds`, one update per changed size.
+
+        Shoe sizes without a `shoe_inventory` row are not tracked and are always
+        available. The counters are owned by this process, so the service must
+        run as a single worker while inventory is tracked.
+
+        Args:
+            flush_interval_seconds (float): How often changed counters are written to the database.
+        """
+        self.flush_interval_seconds = flush_interval_seconds
+        self._total: Dict[int, int] = {}
+        self._available: Dict[int, int] = {}
+        self._row_ids: Dict[int, int] = {}
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Load the counters from the database and start the write-back task."""
+        try:
+            rows = await async_retrieve_query(
+                table="shoe_inventory", columns=INVENTORY_COLUMNS
+            )
+        except Exception as e:
+            logger.error("Failed to load shoe inventory, sizes are untracked: %s", e)
+            rows = []
+
+        with self._lock:
+            self._row_ids.clear()
+            self._total.clear()
+            self._available.clear()
+            for row in rows:
+                shoe_size = row["shoe_size"]
+                self._row_ids[shoe_size] = row["id"]
+                self._total[shoe_size] = row["total"]
+                self._available[shoe_size] = max(0, min(row["available"], row["total"]))
+            self._dirty.clear()
+
+        logger.info("Loaded shoe inventory for %s sizes.", len(rows))
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    def is_tracked(self, shoe_size: int) -> bool:
+        """Return whether the stock of a shoe size is tracked."""
+        return shoe_size in self._total
+
+    def reserve(self, shoe_size: int) -> bool:
+        """Take one pair of a shoe size out of stock.
+
+        Args:
+            shoe_size (int): The shoe size to reserve.
+
+        Returns:
+            bool: True if a tracked pair was reserved, False if the size is untracked.
+
+        Raises:
+            ShoeSizeUnavailableError: If every pair of the size is rented out.
+        """
+        with self._lock:
+            available = self._available.get(shoe_size)
+            if available is None:
+                return False
+            if available <= 0:
+                raise ShoeSizeUnavailableError(
+                    f"Shoe size {shoe_size} is out of stock."
+                )
+            self._available[shoe_size] = available - 1
+            self._dirty.add(shoe_size)
+            return True
+
+    def release(self, shoe_size: int) -> bool:
+        """Put one pair of a shoe size back in stock.
+
+        Args:
+            shoe_size (int): The shoe size being returned.
+
+        Returns:
+            bool: True if a pair was returned, False if the size is untracked or fully stocked.
+        """
+        with self._lock:
+            available = self._available.get(shoe_size)
+            if available is None or available >= self._total[shoe_size]:
+                return False
+            self._available[shoe_size] = available + 1
+            self._dirty.add(shoe_size)
+            return True
+
+    def availability(self, shoe_size: Optional[int] = None) -> List[Dict[str, int]]:
+        """Return the total and available pairs of every tracked size, or of one size.
+
+        Args:
+            shoe_size (Optional[int]): Only return this shoe size.
+
+        Returns:
+            List[Dict[str, int]]: One ``{shoe_size, total, available}`` entry per size, ordered by size.
+        """
+        with self._lock:
+            sizes = sorted(self._total) if shoe_size is None else [shoe_size]
+            return [
+                {
+                    "shoe_size": size,
+                    "total": self._total[size],
+                    "available": self._available[size],
+                }
+                for size in sizes
+                if size in self._total
+            ]
+
+    async def flush(self) -> None:
+        """Write the counters changed since the last flush to the database.
+
+        Sizes whose update fails stay marked as changed and are retried on the next flush.
+        """
+        with self._lock:
+            changes = {size: self._available[size] for size in self._dirty}
+            self._dirty.clear()
+
+        for shoe_size, available in changes.items():
+            try:
+                await async_update_query(
+                    table="shoe_inventory",
+                    data={"available": available},
+                    filters={"id": self._row_ids[shoe_size]},
+                )
+            except Exception as e:
+                logger.error(
+                    "Failed to store inventory of shoe size %s: %s", shoe_size, e
+                )
+                with self._lock:
+                    self._dirty.add(shoe_size)
+
+        if changes:
+            logger.info("Stored inventory of %s shoe sizes.", len(changes))
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    async def stop(self) -> None:
+        """Stop the write-back task and write the remaining changes."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+
+shoe_inventory = ShoeInventory(
+    flush_interval_seconds=settings.INVENTORY_FLUSH_INTERVAL_SECONDS
+)
@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.cache import MISSING, TTLCache
+from app.config import settings
+from app.schema import CustomerRentalsSchema
+from app.services.customer_rentals_services import create_customer_rental_service
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+
+class RentalQueueFullError(Exception):
+    """Raised when a rental cannot be enqueued because the queue is full."""
+
+
+class RentalJobQueue:
+    def __init__(self, max_size: int, workers: int, job_ttl_seconds: float):
+        """Initialize an in-process queue that creates customer rentals in the background.
+
+        Worker tasks are started on the first enqueued job and run
+        `create_customer_rental_service` for each job. Job records are kept in
+        a bounded cache so their status can be polled.
+
+        Args:
+            max_size (int): The maximum number of queued jobs before new jobs are rejected.
+            workers (int): The number of worker tasks.
+            job_ttl_seconds (float): How long job records are kept after their last update.
+        """
+        self.max_size = max_size
+        self.workers = workers
+        self.jobs = TTLCache(max_size=max_size * 10, ttl_seconds=job_ttl_seconds)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker_tasks = [
+                asyncio.ensure_future(self._work(number))
+                for number in range(self.workers)
+            ]
+            logger.info("Started %s rental job workers.", self.workers)
+        return self._queue
+
+    def enqueue(self, payload: CustomerRentalsSchema) -> Dict[str, Any]:
+        """Queue a customer rental for creation.
+
+        Args:
+            payload (CustomerRentalsSchema): The customer rental to create.
+
+        Returns:
+            Dict[str, Any]: The queued job record.
+
+        Raises:
+            RentalQueueFullError: If the queue is full.
+        """
+        queue = self._ensure_started()
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JOB_STATUS_QUEUED,
+            "created_at": now,
+            "updated_at": now,
+            "rental": None,
+            "error": None,
+        }
+
+        try:
+            queue.put_nowait((job["id"], payload))
+        except asyncio.QueueFull:
+            raise RentalQueueFullError(
+                f"The rental queue is full ({self.max_size} pending rentals)."
+            )
+
+        self.jobs.set(job["id"], job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job record for an id, or None when it is unknown or expired."""
+        job = self.jobs.get(job_id)
+        return None if job is MISSING else job
+
+    def _update(self, job_id: str, **changes: Any) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(
+            changes, updated_at=datetime.datetime.now(datetime.timezone.utc).isoformat()
+        )
+        self.jobs.set(job_id, job)
+
+    async def _work(self, number: int) -> None:
+        queue = self._queue
+        while True:
+            job_id, payload = await queue.get()
+            try:
+                self._update(job_id, status=JOB_STATUS_RUNNING)
+                created_rental = await create_customer_rental_service(payload=payload)
+                self._update(
+                    job_id, status=JOB_STATUS_SUCCEEDED, rental=created_rental[0]
+                )
+                logger.info("Rental job %s completed by worker %s.", job_id, number)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Rental job %s failed: %s", job_id, e)
+                self._update(job_id, status=JOB_STATUS_FAILED, error=str(e))
+            finally:
+                queue.task_done()
+
+    def depth(self) -> int:
+        """Return the number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks, abandoning any queued jobs."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+
+rental_job_queue = RentalJobQueue(
+    max_size=settings.RENTAL_QUEUE_MAX_SIZE,
+    workers=settings.RENTAL_QUEUE_WORKERS,
+    job_ttl_seconds=settings.RENTAL_JOB_TTL_SECONDS,
+)
@@ -0,0 +1,224 @@
+import asyncio
+import datetime
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.queries import retrieve_query, run_in_db_executor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+REPORT_GROUPS = ("day", "shoe_size", "discount")
+
+# Columns of the rentals read into the rollups
+ROLLUP_SOURCE_COLUMNS = [
+    "id",
+    "rental_date",
+    "shoe_size",
+    "rental_fee",
+    "discount",
+    "total_fee",
+]
+
+# The rollup is keyed by these columns, so every report grouping can be derived from it
+ROLLUP_KEYS = ["rental_date", "shoe_size", "discount"]
+
+# How each rollup column is combined when rows or rollups are merged
+ROLLUP_AGGREGATIONS = {
+    "rentals": "sum",
+    "rental_fee_sum": "sum",
+    "total_fee_sum": "sum",
+    "total_fee_min": "min",
+    "total_fee_max": "max",
+}
+
+
+def _aggregate_rentals(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Aggregate raw rental rows into rollup rows keyed by date, shoe size and discount."""
+    frame = pd.DataFrame.from_records(rows, columns=ROLLUP_SOURCE_COLUMNS)
+    frame["discount"] = frame["discount"].fillna(0).astype("int64")
+    return frame.groupby(ROLLUP_KEYS, sort=False).agg(
+        rentals=("id", "size"),
+        rental_fee_sum=("rental_fee", "sum"),
+        total_fee_sum=("total_fee", "sum"),
+        total_fee_min=("total_fee", "min"),
+        total_fee_max=("total_fee", "max"),
+    )
+
+
+def _weighted_percentile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+    """Return the `q` percentile (0-100) of values repeated `weights` times."""
+    order = np.argsort(values, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    index = np.searchsorted(cumulative, q / 100 * cumulative[-1], side="left")
+    return float(values[order][min(index, len(order) - 1)])
+
+
+class RentalRollups:
+    def __init__(self, page_size: int):
+        """Initialize incrementally maintained aggregates of the customer rentals.
+
+        Rentals are aggregated per rental date, shoe size and discount. Each
+        refresh only reads the rentals with an id above the highest id seen so
+        far and merges their aggregates into the rollup, so reports never scan
+        the full `customer_rentals` table after the first one. Rentals are
+        treated as append-only.
+
+        Args:
+            page_size (int): Rentals read per query while refreshing.
+        """
+        self.page_size = page_size
+        self.rollup = pd.DataFrame(
+            columns=list(ROLLUP_AGGREGATIONS),
+            index=pd.MultiIndex.from_arrays([[], [], []], names=ROLLUP_KEYS),
+        )
+        self.last_id = 0
+        self._lock = asyncio.Lock()
+
+    def _refresh(self) -> int:
+        # Runs on a database worker thread, reading and aggregating page by page
+        new_rows = 0
+        while True:
+            rows = retrieve_query(
+                table="customer_rentals",
+                columns=ROLLUP_SOURCE_COLUMNS,
+                filters={"id__gt": self.last_id},
+                order_by="id",
+                limit=self.page_size,
+            )
+            if not rows:
+                return new_rows
+
+            delta = _aggregate_rentals(rows)
+            merged = pd.concat([self.rollup, delta]) if len(self.rollup) else delta
+            self.rollup = merged.groupby(level=ROLLUP_KEYS, sort=False).agg(
+                ROLLUP_AGGREGATIONS
+            )
+            self.last_id = rows[-1]["id"]
+            new_rows += len(rows)
+            if len(rows) < self.page_size:
+                return new_rows
+
+    async def refresh(self) -> int:
+        """Merge the rentals created since the last refresh into the rollup.
+
+        Returns:
+            int: The number of new rentals merged.
+        """
+        async with self._lock:
+            new_rows = await run_in_db_executor(self._refresh)
+        if new_rows:
+            logger.info(
+                "Merged %s new rentals into the rental rollups (%s rollup rows).",
+                new_rows,
+                len(self.rollup),
+            )
+        return new_rows
+
+    def report(
+        self,
+        group_by: str,
+        date_from: Optional[datetime.date] = None,
+        date_to: Optional[datetime.date] = None,
+    ) -> Dict[str, Any]:
+        """Summarise the rollup per day, shoe size or discount.
+
+        Args:
+            group_by (str): One of ``"day"``, ``"shoe_size"`` or ``"discount"``.
+            date_from (Optional[datetime.date]): Only include rentals on or after this date.
+            date_to (Optional[datetime.date]): Only include rentals on or before this date.
+
+        Returns:
+            Dict[str, Any]: The per-group statistics in ``groups``, ordered by key, and the
+            same statistics over every included rental in ``totals``.
+
+        Raises:
+            ValueError: If `group_by` is not supported.
+        """
+        if group_by not in REPORT_GROUPS:
+            raise ValueError(
+                f"Unsupported grouping '{group_by}', expected one of: {', '.join(REPORT_GROUPS)}."
+            )
+
+        rollup = self.rollup.reset_index()
+        if date_from is not None:
+            rollup = rollup[rollup["rental_date"] >= date_from.isoformat()]
+        if date_to is not None:
+            rollup = rollup[rollup["rental_date"] <= date_to.isoformat()]
+
+        key = "rental_date" if group_by == "day" else group_by
+        groups = [
+            {"key": group_key, **self._statistics(group)}
+            for group_key, group in rollup.groupby(key, sort=True)
+        ]
+        return {
+            "group_by": group_by,
+            "from": date_from.isoformat() if date_from else None,
+            "to": date_to.isoformat() if date_to else None,
+            "groups": groups,
+            "totals": self._statistics(rollup),
+        }
+
+    @staticmethod
+    def _statistics(rollup: pd.DataFrame) -> Dict[str, Any]:
+        rentals = int(rollup["rentals"].sum())
+        if not rentals:
+            return {
+                "rentals": 0,
+                "gross_revenue": 0.0,
+                "revenue": 0.0,
+                "average_total_fee": None,
+                "min_total_fee": None,
+                "max_total_fee": None,
+                "average_discount": None,
+                "discount_p50": None,
+                "discount_p90": None,
+            }
+
+        discounts = rollup["discount"].to_numpy(dtype="float64")
+        weights = rollup["rentals"].to_numpy(dtype="int64")
+        revenue = float(rollup["total_fee_sum"].sum())
+        return {
+            "rentals": rentals,
+            "gross_revenue": round(float(rollup["rental_fee_sum"].sum()), 2),
+            "revenue": round(revenue, 2),
+            "average_total_fee": round(revenue / rentals, 2),
+            "min_total_fee": float(rollup["total_fee_min"].min()),
+            "max_total_fee": float(rollup["total_fee_max"].max()),
+            "average_discount": round(float(np.average(discounts, weights=weights)), 2),
+            "discount_p50": _weighted_percentile(discounts, weights, 50),
+            "discount_p90": _weighted_percentile(discounts, weights, 90),
+        }
+
+
+rental_rollups = RentalRollups(page_size=settings.REPORT_PAGE_SIZE)
+
+
+async def rental_report_service(
+    group_by: str,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+) -> Dict[str, Any]:
+    """Build a rental report from the incrementally refreshed rollups.
+
+    Args:
+        group_by (str): One of ``"day"``, ``"shoe_size"`` or ``"discount"``.
+        date_from (Optional[datetime.date]): Only include rentals on or after this date.
+        date_to (Optional[datetime.date]): Only include rentals on or before this date.
+
+    Returns:
+        Dict[str, Any]: The report, see `RentalRollups.report`.
+
+    Raises:
+        ValueError: If the grouping or the date range is invalid.
+        Exception: If the new rentals cannot be read.
+    """
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("The report start date is after its end date.")
+
+    await rental_rollups.refresh()
+    return rental_rollups.report(group_by, date_from, date_to)
@@ -0,0 +1,63 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+# Operators accepted as "<column>__<operator>" keys in retrieve_query filters
+FILTER_OPERATORS = ("eq", "neq", "gt", "gte", "lt", "lte", "in")
+
+
+def parse_filter_key(key: str) -> Tuple[str, str]:
+    """Split a filter key into its column and operator.
+
+    Args:
+        key (str): A filter key such as ``"customer_id"`` or ``"rental_date__gte"``.
+
+    Returns:
+        Tuple[str, str]: The column name and the operator, ``"eq"`` when none is given.
+
+    Raises:
+        ValueError: If the operator is not one of `FILTER_OPERATORS`.
+    """
+    column, _, operator = key.partition("__")
+    operator = operator or "eq"
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f"Unsupported filter operator '{operator}' for '{column}'.")
+    return column, operator
+
+
+class StorageBackend(ABC):
+    """Interface of the storage backends behind `app.queries`.
+
+    Filters use the operator-suffixed keys described in `retrieve_query`.
+    Every method is blocking and is called from the database thread pool.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def select(
+        self,
+        table: str,
+        columns: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the selected columns of the rows matching the filters."""
+
+    @abstractmethod
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows and return them as stored, in the order they were given."""
+
+    @abstractmethod
+    def update(
+        self, table: str, data: Dict[str, Any], filters: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Set column values on the rows matching the filters and return the updated rows."""
+
+    @abstractmethod
+    def count(self, table: str, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Return the number of rows matching the filters."""
+
+    def close(self) -> None:
+        """Release the resources held by the backend."""
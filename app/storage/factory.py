@@ -0,0 +1,36 @@
+import logging
+
+from app.config import settings
+from app.storage.base import StorageBackend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STORAGE_BACKENDS = ("supabase", "sqlite")
+
+
+def create_storage_backend() -> StorageBackend:
+    """Create the storage backend selected by `settings.STORAGE_BACKEND`.
+
+    Returns:
+        StorageBackend: The Supabase backend or the embedded SQLite backend.
+
+    Raises:
+        ValueError: If the configured backend is unknown.
+    """
+    if settings.STORAGE_BACKEND == "sqlite":
+        from app.storage.sqlite_backend import SQLiteBackend
+
+        logger.info("Using the SQLite storage backend at '%s'.", settings.SQLITE_PATH)
+        return SQLiteBackend(path=settings.SQLITE_PATH)
+
+    if settings.STORAGE_BACKEND == "supabase":
+        from app.storage.supabase_backend import SupabaseBackend
+        from app.supabase import create_supabase_client
+
+        return SupabaseBackend(client=create_supabase_client())
+
+    raise ValueError(
+        f"Unknown storage backend '{settings.STORAGE_BACKEND}', "
+        f"expected one of: {', '.join(STORAGE_BACKENDS)}."
+    )
@@ -0,0 +1,319 @@
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.storage.base import StorageBackend, parse_filter_key
+
+# Column types of every table, used for DDL, identifier validation and value conversion
+TABLES: Dict[str, Dict[str, str]] = {
+    "customers": {
+        "id": "id",
+        "created_at": "timestamp",
+        "name": "text",
+        "age": "integer",
+        "contact_info": "json",
+        "is_disabled": "boolean",
+        "medical_conditions": "json",
+        "discount": "integer",
+        "discount_version": "text",
+    },
+    "customer_rentals": {
+        "id": "id",
+        "created_at": "timestamp",
+        "customer_id": "integer",
+        "rental_date": "text",
+        "shoe_size": "integer",
+        "rental_fee": "real",
+        "discount": "integer",
+        "total_fee": "real",
+        "discount_source": "text",
+    },
+    "shoe_inventory": {
+        "id": "id",
+        "created_at": "timestamp",
+        "shoe_size": "integer",
+        "total": "integer",
+        "available": "integer",
+    },
+}
+
+COLUMN_DDL = {
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "timestamp": "TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))",
+    "text": "TEXT",
+    "integer": "INTEGER",
+    "real": "REAL",
+    "boolean": "INTEGER",
+    "json": "TEXT",
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_customer_rentals_customer_id ON customer_rentals (customer_id)",
+    "CREATE INDEX IF NOT EXISTS idx_customer_rentals_rental_date ON customer_rentals (rental_date)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_shoe_inventory_shoe_size ON shoe_inventory (shoe_size)",
+]
+
+SQL_OPERATORS = {
+    "eq": "=",
+    "neq": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+# Largest number of bound parameters used for a single "in" filter
+MAX_IN_PARAMETERS = 900
+
+
+class SQLiteBackend(StorageBackend):
+    """Embedded SQLite storage backend for single-site deployments and load tests.
+
+    The database runs in WAL mode so readers never wait for the writer. Each
+    database worker thread keeps its own connection.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        """Open the database, creating the tables and indexes when they are missing.
+
+        Args:
+            path (str): Path of the database file, or ``":memory:"`` for a private in-memory database.
+        """
+        if path == ":memory:":
+            # A named shared-cache database is visible to every thread's connection
+            self._target = f"file:bowling-{id(self)}?mode=memory&cache=shared"
+            self._uri = True
+        else:
+            self._target = path
+            self._uri = False
+        self._local = threading.local()
+        # Every thread's connection, so close() can release them all
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        # Keeps an in-memory database alive and creates the schema
+        self._bootstrap = self._connect()
+        self._create_schema(self._bootstrap)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self._target, uri=self._uri, isolation_level=None, check_same_thread=False
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _create_schema(connection: sqlite3.Connection) -> None:
+        for table, columns in TABLES.items():
+            column_ddl = ", ".join(
+                f"{column} {COLUMN_DDL[column_type]}"
+                for column, column_type in columns.items()
+            )
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_ddl})")
+
+            # Add columns introduced after the database file was created
+            existing = {
+                row["name"] for row in connection.execute(f"PRAGMA table_info({table})")
+            }
+            for column, column_type in columns.items():
+                if column not in existing:
+                    connection.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {column} {COLUMN_DDL[column_type]}"
+                    )
+        for index in INDEXES:
+            connection.execute(index)
+
+    @staticmethod
+    def _columns(table: str) -> Dict[str, str]:
+        if table not in TABLES:
+            raise ValueError(f"Unknown table '{table}'.")
+        return TABLES[table]
+
+    @staticmethod
+    def _check_column(table: str, columns: Dict[str, str], column: str) -> None:
+        if column not in columns:
+            raise ValueError(f"Unknown column '{column}' in table '{table}'.")
+
+    @staticmethod
+    def _to_sql(column_type: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if column_type == "json":
+            return json.dumps(value)
+        if column_type == "boolean":
+            return int(bool(value))
+        return value
+
+    @staticmethod
+    def _from_sql(column_type: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if column_type == "json":
+            return json.loads(value)
+        if column_type == "boolean":
+            return bool(value)
+        return value
+
+    def _row(self, columns: Dict[str, str], row: sqlite3.Row) -> Dict[str, Any]:
+        return {key: self._from_sql(columns[key], row[key]) for key in row.keys()}
+
+    def _where(
+        self, table: str, columns: Dict[str, str], filters: Optional[Dict[str, Any]]
+    ) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        parameters: List[Any] = []
+        for key, value in (filters or {}).items():
+            column, operator = parse_filter_key(key)
+            self._check_column(table, columns, column)
+            if operator == "in":
+                values = list(value)
+                if not values:
+                    clauses.append("0")
+                    continue
+                if len(values) > MAX_IN_PARAMETERS:
+                    raise ValueError(
+                        f"At most {MAX_IN_PARAMETERS} values are supported in an 'in' filter."
+                    )
+                placeholders = ", ".join("?" for _ in values)
+                clauses.append(f"{column} IN ({placeholders})")
+                parameters.extend(
+                    self._to_sql(columns[column], item) for item in values
+                )
+            else:
+                clauses.append(f"{column} {SQL_OPERATORS[operator]} ?")
+                parameters.append(self._to_sql(columns[column], value))
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, parameters
+
+    def select(
+        self,
+        table: str,
+        columns: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        table_columns = self._columns(table)
+        if columns == ["*"]:
+            columns = list(table_columns)
+        for column in columns:
+            self._check_column(table, table_columns, column)
+
+        where, parameters = self._where(table, table_columns, filters)
+        sql = f"SELECT {', '.join(columns)} FROM {table}{where}"
+        if order_by:
+            self._check_column(table, table_columns, order_by)
+            sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(int(limit))
+
+        rows = self.connection.execute(sql, parameters).fetchall()
+        return [self._row(table_columns, row) for row in rows]
+
+    def count(self, table: str, filters: Optional[Dict[str, Any]] = None) -> int:
+        where, parameters = self._where(table, self._columns(table), filters)
+        sql = f"SELECT COUNT(*) FROM {table}{where}"
+        return self.connection.execute(sql, parameters).fetchone()[0]
+
+    def _select_ids(self, table: str, ids: List[int]) -> List[Dict[str, Any]]:
+        table_columns = self._columns(table)
+        rows_by_id: Dict[int, Dict[str, Any]] = {}
+        for start in range(0, len(ids), MAX_IN_PARAMETERS):
+            chunk = ids[start : start + MAX_IN_PARAMETERS]
+            for row in self.select(table, ["*"], filters={"id__in": chunk}):
+                rows_by_id[row["id"]] = row
+        return [rows_by_id[row_id] for row_id in ids if row_id in rows_by_id]
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        table_columns = self._columns(table)
+        connection = self.connection
+        ids: List[int] = []
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                for column in row:
+                    self._check_column(table, table_columns, column)
+                if row:
+                    sql = (
+                        f"INSERT INTO {table} ({', '.join(row)}) "
+                        f"VALUES ({', '.join('?' for _ in row)})"
+                    )
+                else:
+                    sql = f"INSERT INTO {table} DEFAULT VALUES"
+                cursor = connection.execute(
+                    sql,
+                    [
+                        self._to_sql(table_columns[column], value)
+                        for column, value in row.items()
+                    ],
+                )
+                ids.append(cursor.lastrowid)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        return self._select_ids(table, ids)
+
+    def update(
+        self, table: str, data: Dict[str, Any], filters: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        table_columns = self._columns(table)
+        for column in data:
+            self._check_column(table, table_columns, column)
+
+        where, parameters = self._where(table, table_columns, filters)
+        assignments = ", ".join(f"{column} = ?" for column in data)
+        values = [
+            self._to_sql(table_columns[column], value) for column, value in data.items()
+        ]
+
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [
+                row["id"]
+                for row in connection.execute(
+                    f"SELECT id FROM {table}{where}", parameters
+                )
+            ]
+            if ids:
+                connection.execute(
+                    f"UPDATE {table} SET {assignments}{where}", values + parameters
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        return self._select_ids(table, ids)
+
+    def close(self) -> None:
+        """Close the connections opened by every thread and the bootstrap connection."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local.connection = None
+        self._bootstrap.close()
@@ -0,0 +1,73 @@
+from typing import Any, Dict, List, Optional
+
+from postgrest.types import CountMethod
+from supabase import Client
+
+from app.storage.base import StorageBackend, parse_filter_key
+
+
+def apply_filters(query: Any, filters: Dict[str, Any]) -> Any:
+    """Apply operator-suffixed filter conditions to a PostgREST query builder.
+
+    Args:
+        query (Any): The PostgREST query builder.
+        filters (Dict[str, Any]): The filter conditions, see `retrieve_query`.
+
+    Returns:
+        Any: The query builder with the filters applied.
+    """
+    for key, value in filters.items():
+        column, operator = parse_filter_key(key)
+        if operator == "in":
+            query = query.in_(column, list(value))
+        else:
+            query = getattr(query, operator)(column, value)
+    return query
+
+
+class SupabaseBackend(StorageBackend):
+    """Storage backend that pushes every query down to Supabase's PostgREST API."""
+
+    name = "supabase"
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    def select(
+        self,
+        table: str,
+        columns: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        query = self.client.table(table).select(", ".join(columns))
+        if filters:
+            query = apply_filters(query, filters)
+        if order_by:
+            query = query.order(order_by, desc=descending)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload = rows[0] if len(rows) == 1 else rows
+        return self.client.table(table).insert(payload).execute().data
+
+    def update(
+        self, table: str, data: Dict[str, Any], filters: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        query = apply_filters(self.client.table(table).update(data), filters)
+        return query.execute().data
+
+    def count(self, table: str, filters: Optional[Dict[str, Any]] = None) -> int:
+        query = self.client.table(table).select(
+            "id", count=CountMethod.exact, head=True
+        )
+        if filters:
+            query = apply_filters(query, filters)
+        return query.execute().count or 0
+
+    def close(self) -> None:
+        self.client.postgrest.session.close()
@@ -1,8 +1,10 @@
 import logging
 
-from supabase import Client, create_client
+import httpx
+from supabase import Client, ClientOptions, create_client
 
 from app.config import settings
+from app.http_pool import get_sync_transport
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -11,5 +13,18 @@ logger.setLevel(logging.INFO)
 def create_supabase_client() -> Client:
     url: str = settings.SUPABASE_PROJECT_URL
     key: str = settings.SUPABASE_API_KEY
-    supabase: Client = create_client(url, key)
+    options = ClientOptions(postgrest_client_timeout=settings.SUPABASE_TIMEOUT_SECONDS)
+    supabase: Client = create_client(url, key, options=options)
+
+    # Route PostgREST requests through the shared keep-alive connection pool
+    postgrest = supabase.postgrest
+    default_session = postgrest.session
+    postgrest.session = httpx.Client(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=default_session.timeout,
+        follow_redirects=True,
+        transport=get_sync_transport(),
+    )
+    default_session.close()
     return supabase
@@ -0,0 +1,153 @@
+import datetime
+import hashlib
+import threading
+import time
+import uuid
+from email.utils import format_datetime
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from app.config import settings
+
+ETAG_HEADER = "ETag"
+LAST_MODIFIED_HEADER = "Last-Modified"
+
+
+class TableVersion(NamedTuple):
+    latest_id: int
+    rows: int
+    writes: int
+    last_modified: datetime.datetime
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime.datetime]:
+    if isinstance(value, datetime.datetime):
+        timestamp = value
+    else:
+        try:
+            timestamp = datetime.datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp.astimezone(datetime.timezone.utc)
+
+
+class TableVersions:
+    def __init__(self, ttl_seconds: float):
+        """Initialize the change versions of the tables.
+
+        A table's version is derived from its data, the highest `id` and the
+        row count, so inserts and deletes made by other workers or outside the
+        application change it. The data is read again once an observation is
+        older than `ttl_seconds`. Updates do not change either value, so the
+        version also counts the inserts and updates made through this process,
+        which take effect immediately.
+
+        The write counter is kept per process, so ETags are combined with a
+        token unique to the process and never match another process's ETags.
+
+        Args:
+            ttl_seconds (float): How long an observation of a table's data is reused, 0 to read it on every request.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.token = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, TableVersion] = {}
+        self._observed_at: Dict[str, float] = {}
+        self._writes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str) -> Optional[TableVersion]:
+        """Return the version of a table, or None when its data has to be read again."""
+        observed_at = self._observed_at.get(table)
+        if observed_at is None or time.monotonic() - observed_at >= self.ttl_seconds:
+            return None
+        return self._versions.get(table)
+
+    def observe(
+        self, table: str, latest_row: Optional[Mapping[str, Any]], rows: int
+    ) -> TableVersion:
+        """Derive a table's version from its newest row and row count.
+
+        Args:
+            table (str): The table name.
+            latest_row (Optional[Mapping[str, Any]]): The row with the highest `id`, with its
+                `created_at`, or None when the table is empty.
+            rows (int): The number of rows in the table.
+
+        Returns:
+            TableVersion: The table's current version.
+        """
+        latest_row = latest_row or {}
+        latest_id = int(latest_row.get("id") or 0)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            current = self._versions.get(table)
+            writes = self._writes.get(table, 0)
+            if current is None:
+                last_modified = _parse_timestamp(latest_row.get("created_at")) or now
+            elif (current.latest_id, current.rows, current.writes) == (
+                latest_id,
+                rows,
+                writes,
+            ):
+                last_modified = current.last_modified
+            else:
+                last_modified = max(now, current.last_modified)
+
+            version = TableVersion(latest_id, rows, writes, last_modified)
+            self._versions[table] = version
+            self._observed_at[table] = time.monotonic()
+            return version
+
+    def bump(self, table: str) -> None:
+        """Record a write to a table, invalidating the ETags issued for it."""
+        with self._lock:
+            self._writes[table] = self._writes.get(table, 0) + 1
+            self._observed_at.pop(table, None)
+
+    def etag(self, table: str, version: TableVersion, variant: str = "") -> str:
+        """Build the ETag of a response derived from a table version.
+
+        Args:
+            table (str): The table name.
+            version (TableVersion): The version the response was read at.
+            variant (str): Identifies the representation, e.g. the request's query string.
+
+        Returns:
+            str: A quoted strong ETag.
+        """
+        digest = hashlib.sha256(
+            f"{self.token}:{table}:{version.latest_id}:{version.rows}:"
+            f"{version.writes}:{variant}".encode("utf-8")
+        ).hexdigest()[:32]
+        return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return whether an `If-None-Match` request header matches an ETag.
+
+    Args:
+        if_none_match (Optional[str]): The header value, a list of ETags or ``*``.
+        etag (str): The current ETag of the resource.
+
+    Returns:
+        bool: True when the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+def version_headers(etag: str, version: TableVersion) -> Dict[str, str]:
+    """Return the `ETag` and `Last-Modified` headers of a versioned response."""
+    return {
+        ETAG_HEADER: etag,
+        LAST_MODIFIED_HEADER: format_datetime(version.last_modified, usegmt=True),
+    }
+
+
+table_versions = TableVersions(ttl_seconds=settings.TABLE_VERSION_TTL_SECONDS)
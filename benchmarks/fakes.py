@@ -0,0 +1,223 @@
+import asyncio
+import datetime
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI
+from starlette.responses import JSONResponse
+
+from benchmarks.timing import record_stage_time
+
+
+class FakePostgrestQuery:
+    """Query builder mimicking the subset of postgrest-py used by `SupabaseBackend`."""
+
+    def __init__(self, client: "FakePostgrestClient", table: str):
+        self.client = client
+        self.table = table
+        self.columns: Optional[List[str]] = None
+        self.conditions: List[Callable[[Dict[str, Any]], bool]] = []
+        self.order_column: Optional[str] = None
+        self.order_desc = False
+        self.row_limit: Optional[int] = None
+        self.insert_rows: Optional[List[Dict[str, Any]]] = None
+        self.update_data: Optional[Dict[str, Any]] = None
+        self.count_only = False
+
+    def select(
+        self, columns: str, count: Optional[str] = None, head: Optional[bool] = None
+    ) -> "FakePostgrestQuery":
+        self.columns = [column.strip() for column in columns.split(",")]
+        self.count_only = bool(count and head)
+        return self
+
+    def insert(self, rows: Any) -> "FakePostgrestQuery":
+        self.insert_rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, data: Dict[str, Any]) -> "FakePostgrestQuery":
+        self.update_data = data
+        return self
+
+    def _where(self, column: str, test: Callable[[Any], bool]) -> "FakePostgrestQuery":
+        self.conditions.append(
+            lambda row: row.get(column) is not None and test(row.get(column))
+        )
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakePostgrestQuery":
+        return self._where(column, lambda current: current == value)
+
+    def neq(self, column: str, value: Any) -> "FakePostgrestQuery":
+        return self._where(column, lambda current: current != value)
+
+    def gt(self, column: str, value: Any) -> "FakePostgrestQuery":
+        return self._where(column, lambda current: current > value)
+
+    def gte(self, column: str, value: Any) -> "FakePostgrestQuery":
+        return self._where(column, lambda current: current >= value)
+
+    def lt(self, column: str, value: Any) -> "FakePostgrestQuery":
+        return self._where(column, lambda current: current < value)
+
+    def lte(self, column: str, value: Any) -> "FakePostgrestQuery":
+        return self._where(column, lambda current: current <= value)
+
+    def in_(self, column: str, values: List[Any]) -> "FakePostgrestQuery":
+        allowed = set(values)
+        return self._where(column, lambda current: current in allowed)
+
+    def order(self, column: str, desc: bool = False) -> "FakePostgrestQuery":
+        self.order_column = column
+        self.order_desc = desc
+        return self
+
+    def limit(self, count: int) -> "FakePostgrestQuery":
+        self.row_limit = count
+        return self
+
+    def execute(self) -> SimpleNamespace:
+        time.sleep(self.client.latency_seconds)
+        with self.client.lock:
+            if self.count_only:
+                rows = self.client.tables.setdefault(self.table, [])
+                matched = [
+                    row for row in rows if all(test(row) for test in self.conditions)
+                ]
+                return SimpleNamespace(data=[], count=len(matched))
+            return SimpleNamespace(data=self._execute())
+
+    def _execute(self) -> List[Dict[str, Any]]:
+        rows = self.client.tables.setdefault(self.table, [])
+
+        if self.insert_rows is not None:
+            created = []
+            for values in self.insert_rows:
+                self.client.sequences[self.table] = (
+                    self.client.sequences.get(self.table, 0) + 1
+                )
+                row = {
+                    "id": self.client.sequences[self.table],
+                    "created_at": datetime.datetime.now(
+                        datetime.timezone.utc
+                    ).isoformat(),
+                    **values,
+                }
+                rows.append(row)
+                created.append(dict(row))
+            return created
+
+        matched = [row for row in rows if all(test(row) for test in self.conditions)]
+        if self.update_data is not None:
+            for row in matched:
+                row.update(self.update_data)
+            return [dict(row) for row in matched]
+
+        if self.order_column:
+            matched.sort(
+                key=lambda row: row[self.order_column], reverse=self.order_desc
+            )
+        if self.row_limit is not None:
+            matched = matched[: self.row_limit]
+        if self.columns and self.columns != ["*"]:
+            return [
+                {column: row.get(column) for column in self.columns} for row in matched
+            ]
+        return [dict(row) for row in matched]
+
+
+class FakePostgrestClient:
+    """In-memory stand-in for the supabase client's PostgREST interface.
+
+    Each executed query sleeps for `latency_seconds` to simulate the network
+    round trip to Supabase.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.sequences: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def table(self, table: str) -> FakePostgrestQuery:
+        return FakePostgrestQuery(self, table)
+
+
+def create_fake_openai_app(
+    latency_seconds: float = 0.2,
+    latency_jitter_seconds: float = 0.05,
+    error_rate: float = 0.0,
+    discount: int = 10,
+) -> FastAPI:
+    """Create an ASGI app serving a fake OpenAI chat completions endpoint.
+
+    Every completion answers with `discount`, or with a JSON array of it for
+    batched prompts. A share of `error_rate` requests fail with a 503.
+
+    Args:
+        latency_seconds (float): The mean time to answer a completion.
+        latency_jitter_seconds (float): The maximum random deviation from the mean latency.
+        error_rate (float): The share of completions that fail, between 0 and 1.
+        discount (int): The discount returned for every customer.
+
+    Returns:
+        FastAPI: The fake OpenAI app, servable with uvicorn or an in-process ASGI transport.
+    """
+    fake_openai = FastAPI()
+
+    @fake_openai.post("/v1/chat/completions")
+    async def chat_completions(payload: Dict[str, Any]) -> JSONResponse:
+        started = time.perf_counter()
+        delay = latency_seconds + random.uniform(
+            -latency_jitter_seconds, latency_jitter_seconds
+        )
+        await asyncio.sleep(max(delay, 0.0))
+
+        if random.random() < error_rate:
+            record_stage_time("llm", time.perf_counter() - started)
+            return JSONResponse(
+                status_code=503,
+                content={
+                    "error": {
+                        "message": "Fake upstream failure.",
+                        "type": "server_error",
+                    }
+                },
+            )
+
+        prompt = payload["messages"][-1]["content"]
+        batch_size = sum(
+            1 for line in prompt.splitlines() if line.split(". ", 1)[0].isdigit()
+        )
+        content = (
+            f"[{', '.join([str(discount)] * batch_size)}]"
+            if batch_size
+            else str(discount)
+        )
+
+        record_stage_time("llm", time.perf_counter() - started)
+        return JSONResponse(
+            content={
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model") or "fake",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": 2,
+                    "total_tokens": len(prompt) // 4 + 2,
+                },
+            }
+        )
+
+    return fake_openai
@@ -0,0 +1,372 @@
+"""End-to-end load and latency benchmark of the rental API.
+
+Runs the real FastAPI app from `app.main` under uvicorn, backed by a fake
+PostgREST client (or the embedded SQLite backend) and a fake OpenAI chat
+completions server, drives a mixed workload against it and writes throughput
+and latency percentiles per route, split into DB and LLM time, as JSON.
+
+Usage:
+    python -m benchmarks.run --requests 2000 --concurrency 50 --output results.json
+    python -m benchmarks.run --baseline previous.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure the app for offline runs before it is imported
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("OPENAI_GPT_MODEL", "fake-gpt")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from app import queries  # noqa: E402
+from app.ai.gpt import services as gpt_services  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.discount_cache import discount_cache  # noqa: E402
+from app.storage.supabase_backend import SupabaseBackend  # noqa: E402
+from benchmarks.fakes import FakePostgrestClient, create_fake_openai_app  # noqa: E402
+from benchmarks.timing import (  # noqa: E402
+    STAGE_TIMINGS_HEADER,
+    StageTimingMiddleware,
+    TimedBackend,
+    parse_stage_timings,
+)
+
+# Share of requests sent to each route
+WORKLOAD = {
+    "POST /api/v1/customers": 0.1,
+    "GET /api/v1/customers": 0.2,
+    "POST /api/v1/customer/rentals/": 0.4,
+    "GET /api/v1/customer/rentals/": 0.3,
+}
+
+MEDICAL_CONDITIONS = ["Diabetes", "Hypertension", "Chronic Condition", "Asthma", "None"]
+
+
+def random_customer() -> Dict[str, Any]:
+    return {
+        "name": f"Bowler {random.randint(1, 1_000_000)}",
+        "age": random.randint(4, 90),
+        "contact_info": [
+            {
+                "contact_number": "555-0100",
+                "email_address": "bowler@example.com",
+                "address": "1 Lane Street",
+            }
+        ],
+        "is_disabled": random.random() < 0.1,
+        "medical_conditions": random.sample(MEDICAL_CONDITIONS, random.randint(0, 2)),
+    }
+
+
+def configure_app(args: argparse.Namespace) -> None:
+    """Point the app at the fake database and the fake OpenAI server."""
+    if args.db == "postgrest-stub":
+        backend = SupabaseBackend(
+            client=FakePostgrestClient(latency_seconds=args.db_latency_ms / 1000)
+        )
+    else:
+        backend = queries.get_backend()
+    queries.backend = TimedBackend(backend)
+
+    fake_openai = create_fake_openai_app(
+        latency_seconds=args.llm_latency_ms / 1000,
+        latency_jitter_seconds=args.llm_jitter_ms / 1000,
+        error_rate=args.llm_error_rate,
+    )
+    gpt_services.async_client = AsyncOpenAI(
+        api_key="sk-benchmark",
+        base_url="http://fake-openai/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake_openai),
+            base_url="http://fake-openai/v1",
+        ),
+    )
+
+    settings.DISCOUNT_MODE = args.discount_mode
+    if args.no_cache:
+        discount_cache.max_size = 0
+        queries.customer_cache.max_size = 0
+
+    app.add_middleware(StageTimingMiddleware)
+
+
+def seed(customers: int, rentals: int) -> List[int]:
+    """Insert the initial customers and rentals and return the customer ids."""
+    customer_ids: List[int] = []
+    for start in range(0, customers, 500):
+        rows = [random_customer() for _ in range(min(500, customers - start))]
+        customer_ids.extend(
+            row["id"] for row in queries.bulk_create_query("customers", rows)
+        )
+
+    today = datetime.date.today()
+    for start in range(0, rentals, 500):
+        rows = [
+            {
+                "customer_id": random.choice(customer_ids),
+                "rental_date": (
+                    today - datetime.timedelta(days=random.randint(0, 365))
+                ).isoformat(),
+                "shoe_size": random.randint(4, 14),
+                "rental_fee": 50.0,
+                "discount": 10,
+                "total_fee": 40.0,
+            }
+            for _ in range(min(500, rentals - start))
+        ]
+        queries.bulk_create_query("customer_rentals", rows)
+
+    return customer_ids
+
+
+def start_server() -> Tuple[uvicorn.Server, str]:
+    """Serve the app with uvicorn on a free local port in a background thread."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def send_request(
+    client: httpx.AsyncClient, route: str, customer_ids: List[int]
+) -> httpx.Response:
+    _, path = route.split(" ", 1)
+    if route == "POST /api/v1/customers":
+        return await client.post(path, json=random_customer())
+    if route == "POST /api/v1/customer/rentals/":
+        return await client.post(
+            path,
+            json={
+                "customer_id": random.choice(customer_ids),
+                "shoe_size": random.randint(4, 14),
+                "rental_fee": 50.0,
+            },
+        )
+    return await client.get(path, params={"limit": 50})
+
+
+async def drive(
+    base_url: str, customer_ids: List[int], requests: int, concurrency: int
+) -> Tuple[Dict[str, List[Dict[str, float]]], float]:
+    """Send the mixed workload and collect one sample per request."""
+    routes = list(WORKLOAD)
+    weights = list(WORKLOAD.values())
+    samples: Dict[str, List[Dict[str, float]]] = {route: [] for route in routes}
+    remaining = requests
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            route = random.choices(routes, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await send_request(client, route, customer_ids)
+                ok = response.status_code < 400
+                stages = parse_stage_timings(response.headers.get(STAGE_TIMINGS_HEADER))
+            except httpx.HTTPError:
+                ok, stages = False, {}
+            samples[route].append(
+                {
+                    "latency_ms": (time.perf_counter() - started) * 1000,
+                    "db_ms": stages.get("db", 0.0),
+                    "llm_ms": stages.get("llm", 0.0),
+                    "ok": ok,
+                }
+            )
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return samples, elapsed
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[Dict[str, float]], elapsed: float) -> Dict[str, Any]:
+    latencies = [sample["latency_ms"] for sample in samples]
+    count = len(samples)
+
+    def mean(key: str) -> float:
+        return (
+            round(sum(sample[key] for sample in samples) / count, 3) if count else 0.0
+        )
+
+    return {
+        "requests": count,
+        "errors": sum(1 for sample in samples if not sample["ok"]),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": mean("latency_ms"),
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies, default=0.0), 3),
+        },
+        "db_ms_mean": mean("db_ms"),
+        "llm_ms_mean": mean("llm_ms"),
+    }
+
+
+def find_regressions(
+    results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """Compare per-route p95 latency and throughput against a baseline run."""
+    regressions = []
+    for route, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous or not previous["requests"] or not current["requests"]:
+            continue
+
+        previous_p95 = previous["latency_ms"]["p95"]
+        current_p95 = current["latency_ms"]["p95"]
+        if previous_p95 and current_p95 > previous_p95 * (1 + max_regression):
+            regressions.append(
+                f"{route}: p95 latency {current_p95:.1f}ms vs {previous_p95:.1f}ms"
+            )
+
+        previous_rps = previous["throughput_rps"]
+        current_rps = current["throughput_rps"]
+        if previous_rps and current_rps < previous_rps * (1 - max_regression):
+            regressions.append(
+                f"{route}: throughput {current_rps:.1f} rps vs {previous_rps:.1f} rps"
+            )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed-customers", type=int, default=1000)
+    parser.add_argument("--seed-rentals", type=int, default=5000)
+    parser.add_argument(
+        "--db", choices=["postgrest-stub", "sqlite"], default="postgrest-stub"
+    )
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--discount-mode", choices=["rules", "rules_then_llm", "llm"], default="llm"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="disable the discount and customer caches",
+    )
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument(
+        "--baseline", help="results of a previous run to compare against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="allowed relative p95 latency increase or throughput drop per route",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.random_seed)
+
+    configure_app(args)
+    customer_ids = seed(args.seed_customers, args.seed_rentals)
+    server, base_url = start_server()
+
+    try:
+        samples, elapsed = asyncio.run(
+            drive(base_url, customer_ids, args.requests, args.concurrency)
+        )
+    finally:
+        server.should_exit = True
+
+    all_samples = [
+        sample for route_samples in samples.values() for sample in route_samples
+    ]
+    results = {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "config": {
+            key: value for key, value in vars(args).items() if key != "baseline"
+        },
+        "duration_seconds": round(elapsed, 3),
+        "overall": summarize(all_samples, elapsed),
+        "routes": {
+            route: summarize(route_samples, elapsed)
+            for route, route_samples in samples.items()
+        },
+    }
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(results, output, indent=2)
+
+    print(
+        f"{'route':<34}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'db':>8}{'llm':>8}{'err':>6}"
+    )
+    for route, summary in [*results["routes"].items(), ("overall", results["overall"])]:
+        latency = summary["latency_ms"]
+        print(
+            f"{route:<34}{summary['throughput_rps']:>9.1f}{latency['p50']:>9.1f}"
+            f"{latency['p95']:>9.1f}{latency['p99']:>9.1f}{summary['db_ms_mean']:>8.1f}"
+            f"{summary['llm_ms_mean']:>8.1f}{summary['errors']:>6}"
+        )
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = find_regressions(
+                results, json.load(baseline_file), args.max_regression
+            )
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Micro-benchmark of the list endpoint response serialisation.
+
+Compares the stdlib `JSONResponse` path the list endpoints used before with
+`RowsResponse`, with and without schema validation and with column
+projection, on synthetic customer and rental rows shaped like database rows.
+
+Usage:
+    python -m benchmarks.serialization --rows 1000 10000 100000 --output serialization.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Type
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from pydantic import BaseModel  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from app import serialization  # noqa: E402
+from app.schema import (  # noqa: E402
+    CustomerRentalsResponseSchema,
+    CustomerResponseSchema,
+)
+from app.serialization import RowsResponse  # noqa: E402
+
+# Fields requested by the projected variant of each table
+PROJECTIONS = {
+    "customers": ["id", "name", "age"],
+    "customer_rentals": ["id", "shoe_size", "total_fee"],
+}
+
+
+def customer_rows(count: int) -> List[Dict[str, Any]]:
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return [
+        {
+            "id": number,
+            "created_at": created_at,
+            "name": f"Bowler {number}",
+            "age": 4 + number % 86,
+            "contact_info": [
+                {
+                    "contact_number": "555-0100",
+                    "email_address": "bowler@example.com",
+                    "address": "1 Lane Street",
+                }
+            ],
+            "is_disabled": number % 10 == 0,
+            "medical_conditions": ["Diabetes"] if number % 3 == 0 else None,
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def rental_rows(count: int) -> List[Dict[str, Any]]:
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return [
+        {
+            "id": number,
+            "created_at": created_at,
+            "customer_id": 1 + number % 500,
+            "rental_date": "2024-10-17",
+            "shoe_size": 5 + number % 10,
+            "rental_fee": 100.0,
+            "discount": number % 30,
+            "total_fee": 100.0 - number % 30,
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def measure(render: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Return the median and best time of rendering a response, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "bytes": len(response.body),
+    }
+
+
+def benchmark_table(
+    rows: List[Dict[str, Any]],
+    model: Type[BaseModel],
+    projection: List[str],
+    repeat: int,
+) -> Dict[str, Dict[str, float]]:
+    # The database only returns the projected columns
+    projected_rows = [{field: row[field] for field in projection} for row in rows]
+
+    def rows_response(fields: Optional[List[str]], validate: bool) -> Callable:
+        content = projected_rows if fields else rows
+
+        def render() -> RowsResponse:
+            return RowsResponse(content, model=model, fields=fields, validate=validate)
+
+        return render
+
+    variants = {
+        "json_response": lambda: JSONResponse(content=rows),
+        "rows": rows_response(None, validate=False),
+        "rows_validated": rows_response(None, validate=True),
+        "rows_projected": rows_response(projection, validate=False),
+        "rows_projected_validated": rows_response(projection, validate=True),
+    }
+    results = {name: measure(render, repeat) for name, render in variants.items()}
+
+    baseline = results["json_response"]["median_ms"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["median_ms"], 2)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {
+        "encoder": "orjson" if serialization.orjson is not None else "pydantic-core",
+        "results": {},
+    }
+    for count in args.rows:
+        for table, model, make_rows in (
+            ("customers", CustomerResponseSchema, customer_rows),
+            ("customer_rentals", CustomerRentalsResponseSchema, rental_rows),
+        ):
+            results = benchmark_table(
+                make_rows(count), model, PROJECTIONS[table], args.repeat
+            )
+            report["results"].setdefault(table, {})[str(count)] = results
+            for variant, result in results.items():
+                print(
+                    f"{table:<17} {count:>7} rows  {variant:<25}"
+                    f"{result['median_ms']:>10.2f} ms  x{result['speedup']}"
+                )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import contextvars
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.storage.base import StorageBackend
+
+# Header carrying the stage timings of a benchmarked request back to the driver
+STAGE_TIMINGS_HEADER = "x-benchmark-stage-ms"
+
+# Seconds spent in each stage by the request currently being served
+stage_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = (
+    contextvars.ContextVar("stage_timings", default=None)
+)
+
+
+def record_stage_time(stage: str, seconds: float) -> None:
+    """Add time spent in a stage to the timings of the current request."""
+    timings = stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def parse_stage_timings(header: Optional[str]) -> Dict[str, float]:
+    """Parse a stage timings header into milliseconds per stage."""
+    timings: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        stage, _, milliseconds = part.partition("=")
+        if stage and milliseconds:
+            timings[stage.strip()] = float(milliseconds)
+    return timings
+
+
+class StageTimingMiddleware:
+    """ASGI middleware reporting each request's DB and LLM time in a response header.
+
+    Timings are collected until the response starts, so work done by
+    background tasks after the response is not attributed to the request.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = stage_timings.set(timings)
+
+        async def send_with_timings(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                value = ",".join(
+                    f"{stage}={seconds * 1000:.3f}"
+                    for stage, seconds in sorted(timings.items())
+                )
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (STAGE_TIMINGS_HEADER.encode(), value.encode()),
+                    ],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            stage_timings.reset(token)
+
+
+class TimedBackend(StorageBackend):
+    """Storage backend wrapper recording the time spent in each call as DB time."""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+        self.name = backend.name
+
+    def _timed(
+        self, method: Callable[..., List[Dict[str, Any]]], *args: Any, **kwargs: Any
+    ):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record_stage_time("db", time.perf_counter() - started)
+
+    def select(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        return self._timed(self.backend.select, *args, **kwargs)
+
+    def insert(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        return self._timed(self.backend.insert, *args, **kwargs)
+
+    def update(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        return self._timed(self.backend.update, *args, **kwargs)
+
+    def count(self, *args: Any, **kwargs: Any) -> int:
+        return self._timed(self.backend.count, *args, **kwargs)
+
+    def close(self) -> None:
+        self.backend.close()